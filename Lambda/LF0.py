@@ -2,33 +2,77 @@
 
 
 import json
-import boto3
+import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+import clients
+import intents
+import metrics
+from metrics import logger
 
-lex_client = boto3.client('lex-runtime')
+# Lex calls for the messages of one request run on this many threads
+LEX_MAX_WORKERS = int(os.environ.get('LEX_MAX_WORKERS', '4'))
+ERROR_TEXT = "Sorry, I couldn't process that message. Please try again."
+
+# Created on the first request with more than one message and reused while warm
+_executor = None
+
+# Greetings and thanks get their fixed reply here instead of going through Lex and LF1
+classifier = intents.load_classifier()
 
 def process_message(message):
+    with metrics.span('classify'):
+        intent = classifier.classify(message)
+    if intent is not None:
+        logger.debug(f"Answered {message!r} locally as {intent}")
+        return text_message(intents.REPLIES[intent])
+
     # Assuming 'message' contains the text to send to Lex
     # Replace 'BotName' and 'BotAlias' with your Lex bot's name and alias
-    lex_response = lex_client.post_text(
-        botName='Bot name',
-        botAlias='Version',
-        userId='Your user ID',  
-        inputText=message
-    )
+    with metrics.span('lex.post_text'):
+        lex_response = clients.client('lex-runtime').post_text(
+            botName='Bot name',
+            botAlias='Version',
+            userId='Your user ID',  
+            inputText=message
+        )
     
-    print(lex_response["message"])
+    logger.debug(lex_response["message"])
 
     # Here you can format the Lex response as needed
+    return text_message(lex_response['message'])
+
+def text_message(text):
     return {
         "type": "unstructured",
         "unstructured": {
-            "id": "string",  # Modify as necessary
-            "text": lex_response['message'],  # Using the message from Lex response
-            "timestamp": "string"  # Modify as necessary
+            "id": "string",
+            "text": text,
+            "timestamp": "string"
         }
     }
 
+
+def safe_process_message(text):
+    try:
+        return process_message(text)
+    except Exception:
+        print(f"Error processing message {text!r}: {traceback.format_exc()}")
+        return text_message(ERROR_TEXT)
+
+
+def process_messages(texts):
+    # Replies come back in the order of the request; a failed message gets an
+    # apology in its place instead of failing the others
+    global _executor
+    if len(texts) <= 1:
+        return [safe_process_message(text) for text in texts]
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=LEX_MAX_WORKERS)
+    return list(_executor.map(safe_process_message, texts))
+
+
+@metrics.invocation('LF0')
 def lambda_handler(event, context):
     try:
         body = event.get("body")
@@ -36,8 +80,9 @@ def lambda_handler(event, context):
             body = json.loads(body)
         
         # Processing each message in the request
-        print(body["messages"][0]["unstructured"]["text"])
-        response_messages = [process_message(body["messages"][0]["unstructured"]["text"])]
+        texts = [message["unstructured"]["text"] for message in body["messages"]]
+        logger.debug(texts)
+        response_messages = process_messages(texts)
         
         # Construct the successful response
         return {
@@ -62,5 +107,5 @@ def lambda_handler(event, context):
                 "Access-Control-Allow-Methods": "POST, OPTIONS",
                 "Access-Control-Allow-Headers": "Content-Type"
             },
-            "body": json.dumps({"code": 500, "message": e})
+            "body": json.dumps({"code": 500, "message": str(e)})
         }
\ No newline at end of file
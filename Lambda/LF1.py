@@ -1,18 +1,28 @@
 import math
-import dateutil.parser
 import datetime
 import time
 import os
-import logging
-import boto3
 import json
 import re
-from botocore.exceptions import ClientError
+import clients
+import envelope
+import metrics
+from cache import TTLCache, MISSING
+from restaurants import fetch_restaurants, format_email_body, user_details
 
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
-dynamodb_resource = boto3.resource('dynamodb')
-ses_client = boto3.client('ses')
+# Root logger at LOG_LEVEL (INFO unless set); DEBUG brings back the payload dumps
+logger = metrics.logger
+
+# Lex calls this function on every dialog turn, so previous-recs lookups are cached by
+# email. "No record" is cached too, for a shorter time since LF2 may write one soon.
+previous_search_cache = TTLCache(
+    maxsize=int(os.environ.get('PREVIOUS_SEARCH_CACHE_SIZE', '1024')),
+    ttl=int(os.environ.get('PREVIOUS_SEARCH_TTL', '300'))
+)
+PREVIOUS_SEARCH_NEGATIVE_TTL = int(os.environ.get('PREVIOUS_SEARCH_NEGATIVE_TTL', '60'))
+previous_search_lookups = {'count': 0, 'seconds': 0.0}
+# Cache counters already written to a metric record
+previous_search_reported = {'hits': 0, 'misses': 0}
 
 
 
@@ -21,54 +31,27 @@ ses_client = boto3.client('ses')
 SQS_URL = "SQS Queue URL"
 
 def sendSQS(request_data):
-    # Instantiate SQS client using Lambda execution role permissions
-    sqs_client = boto3.client('sqs')
+    # Shared SQS client, created on the first fulfillment
+    sqs_client = clients.client('sqs')
 
     # Assuming request_data keys are exactly as they appear here and match the case used in your slots
-    location = request_data["Location"]
-    cuisine = request_data["Cuisine"]
-    number_of_people = request_data["NumberOfPeople"]
-    dining_date = request_data["DiningDate"]
-    dining_time = request_data["DiningTime"]
-    email = request_data["email"]
-
-    # Message attributes setup
-    message_attributes = {
-        "location": {
-            'DataType': 'String',
-            'StringValue': location
-        },
-        "Cuisine": {
-            'DataType': 'String',
-            'StringValue': cuisine
-        },
-        "NumberOfPeople": {
-            'DataType': 'Number',
-            'StringValue': number_of_people
-        },
-        "DiningDate": {
-            'DataType': 'String',
-            'StringValue': dining_date
-        },
-        "DiningTime": {
-            'DataType': 'String',
-            'StringValue': dining_time
-        },
-        "email": {
-            'DataType': 'String',
-            'StringValue': email
-        }
+    request = {
+        'location': request_data["Location"],
+        'cuisine': request_data["Cuisine"],
+        'number_of_people': request_data["NumberOfPeople"],
+        'dining_date': request_data["DiningDate"],
+        'dining_time': request_data["DiningTime"],
+        'email': request_data["email"],
+        # Optional; LF2 ranks by distance from it when it runs with the embedded catalog
+        'zip_code': request_data.get("ZipCode")
     }
 
-    # The body of the message
-    body = 'Restaurant slots'
-
     # Sending the message to the SQS queue
-    response = sqs_client.send_message(
-        QueueUrl=SQS_URL,  
-        MessageAttributes=message_attributes, 
-        MessageBody=body
-    )
+    with metrics.span('sqs.send_message'):
+        response = sqs_client.send_message(
+            QueueUrl=SQS_URL,  
+            MessageBody=envelope.encode([request])
+        )
 
     return response 
 """ --- Helpers to build responses which match the structure of the necessary dialog actions --- """
@@ -135,6 +118,9 @@ def build_validation_result(is_valid, violated_slot, message_content):
     }
 
 def isvalid_date(date):
+    # dateutil is only needed once a date slot is filled
+    import dateutil.parser
+
     try:
         dateutil.parser.parse(date)
         return True
@@ -150,7 +136,7 @@ def valid_email(email):
 
 
 
-def validate_dining_suggestions(location, cuisine, number_of_people, dining_date, dining_time, email):
+def validate_dining_suggestions(location, cuisine, number_of_people, dining_date, dining_time, email, zip_code=None):
 
     # Locations
     locations = ['manhattan']
@@ -207,6 +193,12 @@ def validate_dining_suggestions(location, cuisine, number_of_people, dining_date
             return build_validation_result(False, 'email', '{} is not a valid email,'
                                            'please enter a valid email'.format(email))
 
+    # ZipCode
+    if zip_code is not None:
+        if not re.fullmatch(r'\d{5}', zip_code):
+            return build_validation_result(False, 'ZipCode', '{} is not a valid zip code, '
+                                           'please enter a 5-digit zip code'.format(zip_code))
+
     return build_validation_result(True, None, None)
 
 
@@ -219,6 +211,8 @@ def dining_suggestions(intent_request):
     dining_date = slots["DiningDate"]
     dining_time = slots["DiningTime"]
     email = slots["email"]
+    # Only present when the bot defines the optional ZipCode slot
+    zip_code = slots.get("ZipCode")
     source = intent_request['invocationSource']
     
     output_session_attributes = intent_request['sessionAttributes'] if intent_request['sessionAttributes'] is not None else {}
@@ -256,12 +250,15 @@ def dining_suggestions(intent_request):
                 "NumberOfPeople": number_of_people,
                 "DiningDate": dining_date,
                 "DiningTime": dining_time,
-                "email": email
+                "email": email,
+                "ZipCode": zip_code
             }
             output_session_attributes['requestData'] = json.dumps(request_data)
 
     if source == 'DialogCodeHook':
-        validation_result = validate_dining_suggestions(location, cuisine, number_of_people, dining_date, dining_time, email)
+        with metrics.span('validate'):
+            validation_result = validate_dining_suggestions(location, cuisine, number_of_people, dining_date, dining_time, email,
+                                                            zip_code)
         if not validation_result['isValid']:
             slots[validation_result['violatedSlot']] = None
             return elicit_slot(intent_request['sessionAttributes'], intent_request['currentIntent']['name'], slots, validation_result['violatedSlot'], validation_result['message'])
@@ -306,54 +303,105 @@ def dispatch(intent_request):
 
 
 def checkPreviousSearches(email):
+    cached = previous_search_cache.get(email)
+    if cached is not MISSING:
+        logger.debug('previous-recs cache hit metrics={}'.format(json.dumps(previous_search_metrics())))
+        return cached
+
     # Reference the 'previous-records' table
-    table = dynamodb_resource.Table('previous-recs')
-    print(f"Checking previous searches for email: {email}")
+    table = clients.resource('dynamodb').Table('previous-recs')
     
     try:
+        start = time.perf_counter()
         # Query the table using the primary partition key 'email'
-        response = table.get_item(
-            Key={
-                'email': email  # This matches the partition key of your table
-            }
-        )
-        print(f"DynamoDB response: {response}")
+        with metrics.span('dynamodb.get_item.previous-recs'):
+            response = table.get_item(
+                Key={
+                    'email': email  # This matches the partition key of your table
+                }
+            )
+        previous_search_lookups['count'] += 1
+        previous_search_lookups['seconds'] += time.perf_counter() - start
         
         if 'Item' in response:
             # Assuming 'restaurants' is the attribute you want from the item
             # The response['Item'] is a dictionary of the record fetched from the table
+            previous_search_cache.set(email, response['Item'])
             return response['Item']
         else:
-            print("No previous restaurant suggestions found for this email.")
+            logger.debug("No previous restaurant suggestions found for this email.")
+            previous_search_cache.set(email, None, ttl=PREVIOUS_SEARCH_NEGATIVE_TTL)
             return None
     except Exception as e:
+        # Errors are not cached so the next turn tries again
         print(f"Error fetching previous restaurant suggestions from DynamoDB: {e}")
         return None
+
+
+def previous_search_metrics():
+    stats = previous_search_cache.stats()
+    lookups = previous_search_lookups['count']
+    average_ms = previous_search_lookups['seconds'] * 1000 / lookups if lookups else 0.0
+    stats['lookups'] = lookups
+    stats['avg_lookup_ms'] = round(average_ms, 3)
+    # Every hit is a get_item that did not happen
+    stats['saved_ms'] = round(stats['hits'] * average_ms, 3)
+    return stats
+
+
+def previous_search_invocation_metrics():
+    # Cache hits and misses since the last invocation's record, for metrics.flush
+    stats = previous_search_metrics()
+    hits = stats['hits'] - previous_search_reported['hits']
+    misses = stats['misses'] - previous_search_reported['misses']
+    previous_search_reported['hits'], previous_search_reported['misses'] = stats['hits'], stats['misses']
+    return {
+        'previous_search.hits': (hits, 'Count'),
+        'previous_search.misses': (misses, 'Count'),
+        'previous_search.saved_ms': (round(hits * stats['avg_lookup_ms'], 3), 'Milliseconds')
+    }
         
 """ --- Send Email  --- """
+def render_previous_search(item):
+    # Items written before previous-recs held only ids carry the rendered HTML
+    if 'restaurant_ids' not in item:
+        return item['restaurants']
+    restaurants = fetch_restaurants(item['restaurant_ids'])
+    with metrics.span('render'):
+        return format_email_body(restaurants, user_details(item))
+
+
 def send_restaurant_suggestions_email(item):
-    # Extract the HTML string containing the restaurant suggestions
-    restaurants_html = item['restaurants']
+    from botocore.exceptions import ClientError
+
+    try:
+        restaurants_html = render_previous_search(item)
+    except Exception as e:
+        # Same as a failed send: the turn goes on without the email
+        print(f"Could not render the previous suggestions: {e}")
+        return
     
     # Now, use this HTML string as the body of your email
     try:
-        response = ses_client.send_email(
-            Source='Senders email',
-            Destination={'ToAddresses': [item['email']]},
-            Message={
-                'Subject': {'Data': 'Your Previous Restaurant Suggestions'},
-                'Body': {
-                    'Html': {'Data': restaurants_html}  # Send the HTML content in the email
+        with metrics.span('ses.send_email'):
+            response = clients.client('ses').send_email(
+                Source='Senders email',
+                Destination={'ToAddresses': [item['email']]},
+                Message={
+                    'Subject': {'Data': 'Your Previous Restaurant Suggestions'},
+                    'Body': {
+                        'Html': {'Data': restaurants_html}  # Send the HTML content in the email
+                    }
                 }
-            }
-        )
-        print(f"Email sent! Message ID: {response['MessageId']}")
+            )
+        logger.debug(f"Email sent! Message ID: {response['MessageId']}")
     except ClientError as e:
         print(f"An error occurred: {e.response['Error']['Message']}")
 
 """ --- Main handler --- """
 
 
+@metrics.invocation('LF1', fields=previous_search_invocation_metrics)
 def lambda_handler(event, context):
     """
     Route the incoming request based on intent.
@@ -1,117 +1,381 @@
 
 
-import boto3
+import asyncio
+import heapq
 import json
+import os
 import random
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import clients
+import envelope
+import metrics
+from cache import TTLCache, MISSING, SingleFlight
+from catalog import Catalog
+from ratelimit import RateLimiter
+from restaurants import (restaurant_cache, fetch_restaurants, format_email_body, user_details, EMAIL_TEMPLATE_HTML,
+                         email_template_data)
+
+logger = metrics.logger
+
+queue_url = 'SQS Queue URL'
+
+# SQS hands out at most 10 messages per receive_message call
+MAX_MESSAGES = 10
+MAX_WORKERS = int(os.environ.get('LF2_MAX_WORKERS', '5'))
+# 'threads' hands each message of a batch to one of MAX_WORKERS threads, which
+# makes its calls one after another. 'async' runs the whole batch on one event
+# loop: every message is in flight at once and the previous-recs write of a
+# request overlaps its email.
+PROCESSING_MODE = os.environ.get('LF2_PROCESSING_MODE', 'threads')
+# boto3 and requests block, so the event loop runs their calls on this many threads
+ASYNC_MAX_IN_FLIGHT = int(os.environ.get('LF2_ASYNC_MAX_IN_FLIGHT', '16'))
+
+SENDER_EMAIL = "Senders email"
+EMAIL_SUBJECT = "Restaurant Recommendations"
+EMAIL_TEXT = 'Here are your recommendations!'
+# 'bulk' collects the emails of a batch and sends them through a stored SES
+# template, 50 recipients per call; 'single' sends each one with send_email
+EMAIL_DELIVERY = os.environ.get('EMAIL_DELIVERY', 'bulk')
+EMAIL_TEMPLATE = os.environ.get('EMAIL_TEMPLATE', 'restaurant-suggestions')
+MAX_BULK_DESTINATIONS = 50
+# SES counts its sending rate per recipient; this keeps one container under it
+ses_rate_limiter = RateLimiter(float(os.environ.get('SES_MAX_SEND_RATE', '14')))
+SES_THROTTLING_ERRORS = ('Throttling', 'ThrottlingException', 'MaxSendingRateExceeded')
+# Per-recipient statuses of a bulk send that are worth another attempt
+SES_RETRY_STATUSES = ('AccountThrottled', 'TransientFailure')
+# Seconds before a container that could not set up the template tries again
+EMAIL_TEMPLATE_ERROR_TTL = 300
+
+# Ranked candidates per (location, cuisine), built at ingest by yelp/build_top_lists.py
+TOP_LISTS_TABLE = os.environ.get('TOP_LISTS_TABLE', 'restaurant-top-lists')
+top_list_cache = TTLCache(maxsize=64, ttl=int(os.environ.get('TOP_LIST_CACHE_TTL', '300')))
+TOP_LIST_ERROR_TTL = 30
+top_list_loads = SingleFlight()
+
+# Requests for the same (location, cuisine) that arrive together share one search
+# for a pool of candidate ids, kept for a few seconds; each request then draws its
+# own k from the pool. 0 searches for k ids per request instead.
+CUISINE_POOL_SIZE = int(os.environ.get('CUISINE_POOL_SIZE', '100'))
+cuisine_pool_cache = TTLCache(maxsize=64, ttl=float(os.environ.get('CUISINE_POOL_TTL', '10')))
+cuisine_pool_loads = SingleFlight()
+
+ES_URL = os.environ.get('ES_URL', 'Open Search URL')
+ES_AUTH = ('Username', 'Password')
+SUGGESTION_COUNT = 3
+# How long previous-recs keeps a search for LF1 to send again
+PREVIOUS_RECS_TTL = int(os.environ.get('PREVIOUS_RECS_TTL_DAYS', '30')) * 24 * 3600
+
+# 'embedded' answers cuisine lookups from the catalog bundled with the function and
+# only goes to OpenSearch/DynamoDB when it has nothing for the cuisine
+CATALOG_MODE = os.environ.get('CATALOG_MODE', 'remote')
+CATALOG_PATH = os.environ.get('CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'yelp_data.json'))
+
+
+def load_catalog():
+    if CATALOG_MODE != 'embedded':
+        return None
+    try:
+        return Catalog.load(CATALOG_PATH)
+    except Exception as e:
+        print(f"Could not load the embedded catalog, using the remote backends: {e}")
+        return None
 
-sqs_client = boto3.client('sqs')
-dynamodb = boto3.resource('dynamodb')
-es_client = boto3.client('es')
 
+def load_geo_index(catalog):
+    if catalog is None:
+        return None
+    try:
+        # numpy is only imported when there is a catalog to index
+        from geo import GeoIndex
+    except ImportError:
+        # numpy is not in the deployment package, so suggestions stay random
+        return None
+    return GeoIndex(catalog)
+
+
+def get_geo_index():
+    # Built by the first request with a zip code, so that importing numpy and
+    # reading every coordinate is not part of the cold start of the others
+    global _geo_index, _geo_index_loaded
+    if not _geo_index_loaded:
+        with _geo_index_lock:
+            if not _geo_index_loaded:
+                _geo_index = load_geo_index(catalog)
+                _geo_index_loaded = True
+    return _geo_index
+
+
+catalog = load_catalog()
+_geo_index = None
+_geo_index_loaded = False
+_geo_index_lock = threading.Lock()
+
+_es_session = None
+_es_session_lock = threading.Lock()
+_email_template_ready = False
+_email_template_retry_at = 0.0
+_batch_executor = None
+_io_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_es_session():
+    # One keep-alive session for every search, sized so each worker thread can hold a connection
+    global _es_session
+    if _es_session is None:
+        with _es_session_lock:
+            if _es_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.headers.update({'Content-Type': 'application/json'})
+                pool_size = max(MAX_WORKERS, ASYNC_MAX_IN_FLIGHT) if PROCESSING_MODE == 'async' else MAX_WORKERS
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+                session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+                _es_session = session
+    return _es_session
+
+
+@metrics.invocation('LF2')
 def lambda_handler(event, context):
 
-    ses_client = boto3.client('ses')
-
-    queue_url = 'SQS Queue URL'
-    ids = []
-    sqs_response = sqs_client.receive_message(
-        QueueUrl=queue_url,
-        MaxNumberOfMessages=1,
-        MessageAttributeNames=['All']
-    )
-
-    if 'Messages' in sqs_response:
-        message = sqs_response["Messages"][0]
-        receipt_handle = message['ReceiptHandle']
-
-        if 'MessageAttributes' in message:
-            message_attributes = message['MessageAttributes']
-            cuisine_type = message_attributes['Cuisine']['StringValue'] if 'Cuisine' in message_attributes else None
-            location = message_attributes['Location']['StringValue'] if 'Location' in message_attributes else None
-            email = message_attributes['email']['StringValue'] if 'email' in message_attributes else None
-            num_people = message_attributes['NumberOfPeople'][
-                'StringValue'] if 'NumberOfPeople' in message_attributes else None
-            date = message_attributes['DiningDate']['StringValue'] if 'DiningDate' in message_attributes else None
-            time = message_attributes['DiningTime']['StringValue'] if 'DiningTime' in message_attributes else None
-
-            user_details = {
-                'Location': 'Manhattan',
-                'Cuisine': cuisine_type,
-                'Number_people': num_people,
-                'Date': date,
-                'Time': time
-            }
-        print(cuisine_type, "===============")
-        es_response = es_query_for_cuisine(es_client, cuisine_type)
-        print("====================================== ES ========================",es_response)
-        print("Received message attributes:", message_attributes)
+    ses_client = clients.client('ses')
 
+    with metrics.span('sqs.receive_message'):
+        sqs_response = clients.client('sqs').receive_message(
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=MAX_MESSAGES,
+            # Only messages queued before the envelope still carry attributes
+            MessageAttributeNames=['All']
+        )
 
-        if len(es_response) > 0:
-            ids = random.sample(es_response, 3)
-        
-        restaurants = []
-        
-        for id in ids:    
-            restaurant_info = fetch_restaurant_info(dynamodb, id)
-            restaurants.append(restaurant_info)
+    messages = sqs_response.get('Messages', [])
+    if not messages:
+        return {
+            'statusCode': 200,
+            'body': json.dumps('No message in queue')
+        }
 
-        
-        
-        email_body = format_email_body(restaurants, user_details)
-        
-        resp = save_user_search(email, location, cuisine_type, email_body)
-        
-        if resp:
-            print("Previous recommendations for {email} loaded successfully.")
+    failures = handle_messages(messages, ses_client, queue_url)
 
-        send_email(ses_client, 'Receivers Email', email_body)
-        
-        
-        print(f"Location before save_user_search: {location}")
-        #new line added ====================================================================
-        
-        
-        
+    # Failed messages are left on the queue and come back after the visibility timeout
+    message = {
+        'message': 'Email sent succesfully' if not failures else 'Some messages failed',
+        'received': len(messages),
+        'processed': len(messages) - len(failures),
+        'batchItemFailures': failures,
+        'restaurantCache': restaurant_cache.stats(),
+        'cuisinePool': cuisine_pool_stats()
+    }
 
-        
-        sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=receipt_handle)
+    return {
 
-        message = {
-            'message': 'Email sent succesfully'
-        }
+        'statusCode': 200,
+        'body': json.dumps(message)
+    }
 
-        return {
 
-            'statusCode': 200,
-            'body': json.dumps(message)
-        }
+def handle_messages(messages, ses_client, queue_url):
+    # Processes a batch received from queue_url and deletes what succeeded there;
+    # returns the failures, which come back after the visibility timeout
+    if PROCESSING_MODE == 'async':
+        processed, failures = asyncio.run(process_batch_async(messages, ses_client))
+    else:
+        processed, failures = process_batch(messages, ses_client)
+    return failures + delete_messages(queue_url, processed)
+
+
+def process_batch(messages, ses_client):
+    processed = []
+    failures = []
+    # In bulk mode each message collects its emails here instead of sending them
+    outboxes = {message['MessageId']: [] for message in messages} if EMAIL_DELIVERY == 'bulk' else {}
+
+    executor = get_batch_executor()
+    futures = [(message, executor.submit(process_message, message, ses_client, outboxes.get(message['MessageId'])))
+               for message in messages]
+
+    for message, future in futures:
+        try:
+            future.result()
+            processed.append(message)
+        except Exception as e:
+            print(f"Failed to process message {message['MessageId']}: {e}")
+            failures.append({'itemIdentifier': message['MessageId']})
+
+    if outboxes and processed:
+        processed, unsent = send_outboxes(ses_client, processed, outboxes)
+        failures += unsent
+
+    return processed, failures
+
+
+def send_outboxes(ses_client, processed, outboxes):
+    # Returns the messages whose emails all went out and failures for the others
+    deliveries = [(message, delivery) for message in processed for delivery in outboxes[message['MessageId']]]
+    sent = send_bulk_emails(ses_client, [delivery for _, delivery in deliveries])
+    unsent = {message['MessageId'] for (message, _), ok in zip(deliveries, sent) if not ok}
+    # A message whose email did not go out stays on the queue like any other failure
+    return ([message for message in processed if message['MessageId'] not in unsent],
+            [{'itemIdentifier': message_id} for message_id in unsent])
+
+
+def get_batch_executor():
+    # Kept across warm invocations: each thread holds its own DynamoDB resource
+    # (clients.resource), which would be created again by a fresh pool's threads
+    global _batch_executor
+    if _batch_executor is None:
+        with _executor_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='lf2-batch')
+    return _batch_executor
+
+
+def get_io_executor():
+    # Kept across warm invocations; asyncio.run would shut down the loop's default executor
+    # The worker's pollers run batches at the same time, so only one of them creates it
+    global _io_executor
+    if _io_executor is None:
+        with _executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(max_workers=ASYNC_MAX_IN_FLIGHT, thread_name_prefix='lf2-io')
+    return _io_executor
+
+
+async def process_batch_async(messages, ses_client):
+    # Same results as process_batch; only the order of the calls differs
+    loop = asyncio.get_running_loop()
+    executor = get_io_executor()
+    outboxes = {message['MessageId']: [] for message in messages} if EMAIL_DELIVERY == 'bulk' else {}
+    # In bulk mode the previous-recs writes are still running while the emails go out
+    saves = []
+
+    def run(function, *args):
+        return loop.run_in_executor(executor, function, *args)
+
+    async def handle_request(request, outbox):
+        restaurants = await run(find_request_restaurants, request)
+        details = user_details(request)
+        save = run(save_user_search, request['email'], request, restaurants)
+        if outbox is not None:
+            outbox.append({'email': 'Receivers Email', 'restaurants': restaurants, 'details': details})
+            saves.append(save)
+            return
+        await asyncio.gather(save, run(deliver_email, ses_client, restaurants, details))
+
+    async def handle_message(message):
+        outbox = outboxes.get(message['MessageId'])
+        await asyncio.gather(*(handle_request(request, outbox) for request in envelope.from_sqs_message(message)))
+
+    processed, failures = [], []
+    results = await asyncio.gather(*(handle_message(message) for message in messages), return_exceptions=True)
+    for message, result in zip(messages, results):
+        if isinstance(result, Exception):
+            print(f"Failed to process message {message['MessageId']}: {result}")
+            failures.append({'itemIdentifier': message['MessageId']})
+        else:
+            processed.append(message)
 
+    if outboxes and processed:
+        (processed, unsent), _ = await asyncio.gather(run(send_outboxes, ses_client, processed, outboxes),
+                                                      asyncio.gather(*saves))
+        failures += unsent
     else:
-        return {
-            'statusCode': 200,
-            'body': json.dumps('No message in queue')
-        }
+        await asyncio.gather(*saves)
+
+    return processed, failures
+
+
+def delete_messages(queue_url, messages):
+    failures = []
+
+    for start in range(0, len(messages), MAX_MESSAGES):
+        chunk = messages[start:start + MAX_MESSAGES]
+        entries = [
+            {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']}
+            for i, message in enumerate(chunk)
+        ]
+        with metrics.span('sqs.delete_message_batch'):
+            response = clients.client('sqs').delete_message_batch(QueueUrl=queue_url, Entries=entries)
+
+        for failed in response.get('Failed', []):
+            message = chunk[int(failed['Id'])]
+            print(f"Failed to delete message {message['MessageId']}: {failed.get('Message')}")
+            failures.append({'itemIdentifier': message['MessageId']})
+
+    return failures
+
+
+def process_message(message, ses_client, outbox=None):
+    # A message may carry several requests; if any of them fails the whole message is retried
+    for request in envelope.from_sqs_message(message):
+        process_request(request, ses_client, outbox)
+
+
+def process_request(request, ses_client, outbox=None):
+    email = request['email']
+
+    restaurants = find_request_restaurants(request)
+
+    details = user_details(request)
+
+    resp = save_user_search(email, request, restaurants)
+
+    if resp:
+        logger.debug(f"Previous recommendations for {email} saved.")
+
+    if outbox is not None:
+        outbox.append({'email': 'Receivers Email', 'restaurants': restaurants, 'details': details})
+        return
+    deliver_email(ses_client, restaurants, details)
+
+
+def find_request_restaurants(request):
+    cuisine_type = request['cuisine']
+    location = request['location']
+
+    logger.debug(f"Finding {cuisine_type} restaurants in {location}")
+
+    with metrics.span('find_restaurants'):
+        return find_restaurants(cuisine_type, near=request.get('zip_code'), location=location)
+
+
+def deliver_email(ses_client, restaurants, details):
+    with metrics.span('render'):
+        email_body = format_email_body(restaurants, details)
+    if not send_email(ses_client, 'Receivers Email', email_body):
+        raise RuntimeError('Email could not be sent')
+
 
 # new function added ====================================================================================
 
-def save_user_search(email, location, cuisine, restaurants):
-    print(f"Inside save_user_search, location: {location}")
+def save_user_search(email, request, restaurants):
+    # Only the slots and the restaurant ids are kept; LF1 renders the email again
+    # from them, so the item stays a few hundred bytes instead of the whole HTML
     try:
         table_name = 'previous-recs'
-        table = dynamodb.Table(table_name)
-        
+        table = clients.resource('dynamodb').Table(table_name)
         
+        searched_at = int(time.time())
         
-        response = table.put_item(
-            Item = {
-                'email': email,
-                'location': 'Manhattan',
-                'cuisine': cuisine,
-                'restaurants':restaurants
-            }
-        )
+        with metrics.span('dynamodb.put_item.previous-recs'):
+            response = table.put_item(
+                Item = {
+                    'email': email,
+                    'location': request['location'],
+                    'cuisine': request['cuisine'],
+                    'number_of_people': request['number_of_people'],
+                    'dining_date': request['dining_date'],
+                    'dining_time': request['dining_time'],
+                    'restaurant_ids': [restaurant['business_id'] for restaurant in restaurants],
+                    'searched_at': searched_at,
+                    # DynamoDB's TTL deletes the item once this epoch second has passed
+                    'expires_at': searched_at + PREVIOUS_RECS_TTL
+                }
+            )
         
         return True;
         
@@ -120,117 +384,274 @@ def save_user_search(email, location, cuisine, restaurants):
         return False
 
 
-def es_query_for_cuisine(es_client, cuisine_type):
-    es_url = 'Open Search URL'
-    headers = {'Content-Type': 'application/json'}
-    auth = ('Username', 'Password')
+def find_restaurants(cuisine_type, k=SUGGESTION_COUNT, near=None, location=None):
+    # near is a zip code or (lat, lon); with the embedded catalog the closest
+    # restaurants are suggested instead of a random sample. Otherwise a precomputed
+    # top list for the location answers with one read, and the search is the fallback.
+    if catalog is not None:
+        geo_index = get_geo_index() if near else None
+        if geo_index is not None:
+            restaurants = [dict(catalog.record(row), distance_km=round(distance, 2))
+                           for row, distance in geo_index.nearest(near, k, cuisine_type)]
+        else:
+            restaurants = catalog.sample(cuisine_type, k)
+        if restaurants:
+            return restaurants
+
+    if location:
+        candidates = load_top_list(location, cuisine_type)
+        if candidates:
+            return pick_weighted(candidates, k)
+
+    if CUISINE_POOL_SIZE > 0:
+        pool = cuisine_pool(location, cuisine_type)
+        es_response = random.sample(pool, min(k, len(pool)))
+    else:
+        # The search already returns a random sample of at most k ids
+        es_response = es_query_for_cuisine(cuisine_type, k)[:k]
+    logger.debug(f"OpenSearch ids: {es_response}")
+
+    return fetch_restaurants(es_response)
+
+
+def cuisine_pool(location, cuisine):
+    key = top_list_key(location or '', cuisine)
+    pool = cuisine_pool_cache.get(key)
+    if pool is MISSING:
+        pool = cuisine_pool_loads.do(key, lambda: search_cuisine_pool(key, cuisine))
+    return pool
+
+
+def search_cuisine_pool(key, cuisine):
+    # The seeded random score makes the pool a fresh sample when a cuisine has
+    # more matches than CUISINE_POOL_SIZE. A failed search is not cached.
+    pool = es_query_for_cuisine(cuisine, CUISINE_POOL_SIZE)
+    if pool:
+        cuisine_pool_cache.set(key, pool)
+    return pool
+
+
+def cuisine_pool_stats():
+    # Lookups answered without a search of their own, from the cache or by joining
+    # a search already in flight
+    lookups = cuisine_pool_cache.hits + cuisine_pool_cache.misses
+    return {
+        'lookups': lookups,
+        'searches': cuisine_pool_loads.calls,
+        'shared': cuisine_pool_loads.shared,
+        'coalescing_ratio': round(1 - cuisine_pool_loads.calls / lookups, 4) if lookups else 0.0
+    }
+
+
+def top_list_key(location, cuisine):
+    # Must match yelp/build_top_lists.list_key
+    cuisine = str(cuisine).strip()
+    if cuisine.lower().endswith(' restaurant'):
+        cuisine = cuisine[:-len(' restaurant')]
+    return '{}#{}'.format(str(location).strip().lower(), cuisine.lower())
+
+
+def load_top_list(location, cuisine):
+    # Candidates are [business_id, name, rating, number_of_reviews, address, weight];
+    # pairs without a list are cached as None so they go straight to the search
+    key = top_list_key(location, cuisine)
+    candidates = top_list_cache.get(key)
+    if candidates is MISSING:
+        # A burst of messages for a cold key makes one read
+        candidates = top_list_loads.do(key, lambda: read_top_list(key))
+    return candidates
+
+
+def read_top_list(key):
+    try:
+        with metrics.span('dynamodb.get_item.top-lists'):
+            item = clients.resource('dynamodb').Table(TOP_LISTS_TABLE).get_item(Key={'list_key': key}).get('Item')
+    except Exception as e:
+        # Without the table every message would pay for a failed read; retry later
+        print(f"Could not read the top list for {key}: {e}")
+        top_list_cache.set(key, None, ttl=TOP_LIST_ERROR_TTL)
+        return None
+    candidates = json.loads(item['candidates']) if item else None
+    top_list_cache.set(key, candidates)
+    return candidates
+
+
+def pick_weighted(candidates, k=SUGGESTION_COUNT, rng=random):
+    # Weighted sampling without replacement: each candidate draws u ** (1 / weight)
+    # and the k largest draws win
+    picked = heapq.nlargest(k, candidates, key=lambda candidate: rng.random() ** (1.0 / candidate[5]))
+    return [
+        {'business_id': business_id, 'name': name, 'rating': rating, 'number_of_reviews': reviews, 'address': address}
+        for business_id, name, rating, reviews, address, _ in picked
+    ]
+
+
+def es_query_for_cuisine(cuisine_type, k=SUGGESTION_COUNT, seed=None):
+    # Sampling is pushed down to OpenSearch with a seeded random score, so only
+    # k business ids come back instead of 100 full documents
+    if seed is None:
+        seed = random.getrandbits(31)
     query = {
         "query": {
-            "match": {
-                "cuisine": cuisine_type
+            "function_score": {
+                "query": {
+                    "match": {
+                        "cuisine": cuisine_type
+                    }
+                },
+                "random_score": {
+                    "seed": seed,
+                    "field": "_seq_no"
+                },
+                "boost_mode": "replace"
             }
-        },  "size":100
+        },
+        "_source": ["business_id"],
+        "size": k
     }
     try:
-        response = requests.get(es_url, headers=headers, auth=auth, data=json.dumps(query))
+        with metrics.span('opensearch.search'):
+            response = get_es_session().get(ES_URL, auth=ES_AUTH, data=json.dumps(query), timeout=5)
         if response.status_code == 200:
             results = response.json()
-            print(results['hits']['hits'][0]['_source']['business_id'])
-            
-            ids = []
-            for res in results['hits']['hits']:
-                id = res['_source']['business_id']
-                ids.append(id)
-            return ids
-        
-    except Exception as e:
-        print(e)
-    return [] # if error comes put this return [] on line 135==================================
+            return [res['_source']['business_id'] for res in results['hits']['hits']]
+        print(f"OpenSearch returned {response.status_code}")
 
-def fetch_restaurant_info(dynamodb, restaurant_id):
-    table_name = 'yelp-restaurants'
-    table = dynamodb.Table(table_name)
-
-    try:
-        response = table.get_item(
-            Key={'business_id': restaurant_id}
-        )
-
-        if 'Item' in response:
-
-            return response['Item']
-        else:
-            print(f"No item found with id: {restaurant_id}")
-            return None
     except Exception as e:
-        print(f"Failed to fetch item from DynamoDB: {str(e)}")
-        return None
-
-
-def format_email_body(restaurants_info, user_details):
-    html = """<tr style="background-color: #f2f2f2;">
-    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Name</th>
-    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Rating</th>
-    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Review Count</th>
-    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Address</th>
-    """
-
-    for data in restaurants_info:
-        address = data['address'].replace("\'", '').replace('[', '').replace(']', '').replace('"', '')
-
-        # Append a row to the table for each JSON object
-        html += f"""
-                <tr>
-                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{data['name']}</td>
-                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{data['rating']}</td>
-                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{data['number_of_reviews']}</td>
-                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{address}</td>
-                </tr>
-        """
-
-    html_1 = f'''<html><head></head><body><p>Here are the requested suggestions for the following details: <br> Location: {user_details['Location']} <br> 
-    Number of people: {user_details['Number_people']} <br>
-    Cuisine: {user_details['Cuisine']} <br>
-    Date: {user_details['Date']} <br>
-    Time: {user_details['Time']} <br>
-    </p><p><table style="width: 100%; border-collapse: collapse; border: 1px solid #ddd;">>'''
-    html_2 = "</table></p></body></html>"
-
-    print(html_1 + html + html_2)
-
-    return html_1 + html + html_2
+        print(e)
+    return []
 
 
 def send_email(ses_client, email, email_body):
-    sender_email = "Senders email"
+    sender_email = SENDER_EMAIL
 
-    subject = "Restaurant Recommendations"
+    subject = EMAIL_SUBJECT
 
     try:
-        response = ses_client.send_email(
-            Source=sender_email,
-            Destination={
-                'ToAddresses': [
-                    email
-                ]
-            },
-            Message={
-                'Subject': {
-                    'Data': subject,
-                    'Charset': 'UTF-8'
+        ses_rate_limiter.acquire()
+        with metrics.span('ses.send_email'):
+            response = ses_client.send_email(
+                Source=sender_email,
+                Destination={
+                    'ToAddresses': [
+                        email
+                    ]
                 },
-                'Body': {
-                    'Text': {
-                        'Data': 'Here are your recommendations!',
+                Message={
+                    'Subject': {
+                        'Data': subject,
                         'Charset': 'UTF-8'
                     },
-                    'Html': {
-                        'Data': email_body,
-                        'Charset': 'UTF-8'
+                    'Body': {
+                        'Text': {
+                            'Data': EMAIL_TEXT,
+                            'Charset': 'UTF-8'
+                        },
+                        'Html': {
+                            'Data': email_body,
+                            'Charset': 'UTF-8'
+                        }
                     }
                 }
-            }
-        )
-        print("Email sent! Message ID:", response['MessageId'])
+            )
+        logger.debug(f"Email sent! Message ID: {response['MessageId']}")
+        return True
     except Exception as e:
-        print(f"Failed to send email: {str(e)}")
\ No newline at end of file
+        print(f"Failed to send email: {str(e)}")
+        return False
+
+
+def error_code(error):
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+
+def ensure_email_template(ses_client):
+    # Creates the template, or updates it when the email changed, once per container
+    global _email_template_ready, _email_template_retry_at
+    if _email_template_ready:
+        return True
+    if time.monotonic() < _email_template_retry_at:
+        # Failed recently (e.g. no ses:GetTemplate); emails go out one by one until then
+        return False
+    template = {'TemplateName': EMAIL_TEMPLATE, 'SubjectPart': EMAIL_SUBJECT,
+                'HtmlPart': EMAIL_TEMPLATE_HTML, 'TextPart': EMAIL_TEXT}
+    try:
+        try:
+            current = ses_client.get_template(TemplateName=EMAIL_TEMPLATE)['Template']
+        except Exception as e:
+            if error_code(e) != 'TemplateDoesNotExist':
+                raise
+            ses_client.create_template(Template=template)
+        else:
+            if any(current.get(part) != template[part] for part in ('SubjectPart', 'HtmlPart', 'TextPart')):
+                ses_client.update_template(Template=template)
+    except Exception as e:
+        print(f"Could not set up the email template {EMAIL_TEMPLATE}: {e}")
+        _email_template_retry_at = time.monotonic() + EMAIL_TEMPLATE_ERROR_TTL
+        return False
+    _email_template_ready = True
+    return True
+
+
+def send_bulk_emails(ses_client, deliveries):
+    # deliveries are {'email', 'restaurants', 'details'}; returns whether each was sent
+    if not deliveries:
+        return []
+    if not ensure_email_template(ses_client):
+        # Without a template every email is rendered and sent on its own
+        return [send_email(ses_client, delivery['email'], format_email_body(delivery['restaurants'], delivery['details']))
+                for delivery in deliveries]
+
+    sent = []
+    for start in range(0, len(deliveries), MAX_BULK_DESTINATIONS):
+        destinations = [
+            {
+                'Destination': {'ToAddresses': [delivery['email']]},
+                'ReplacementTemplateData': json.dumps(email_template_data(delivery['restaurants'], delivery['details']),
+                                                      separators=(',', ':'))
+            }
+            for delivery in deliveries[start:start + MAX_BULK_DESTINATIONS]
+        ]
+        sent.extend(send_bulk_chunk(ses_client, destinations))
+    return sent
+
+
+def send_bulk_chunk(ses_client, destinations, max_attempts=4):
+    global _email_template_ready
+    sent = [False] * len(destinations)
+    pending = list(range(len(destinations)))
+    for attempt in range(max_attempts):
+        ses_rate_limiter.acquire(len(pending))
+        try:
+            with metrics.span('ses.send_bulk_templated_email'):
+                response = ses_client.send_bulk_templated_email(
+                    Source=SENDER_EMAIL,
+                    Template=EMAIL_TEMPLATE,
+                    DefaultTemplateData='{}',
+                    Destinations=[destinations[i] for i in pending]
+                )
+        except Exception as e:
+            if error_code(e) == 'TemplateDoesNotExist' and attempt == 0:
+                # Deleted since this container created it
+                _email_template_ready = False
+                if not ensure_email_template(ses_client):
+                    return sent
+            elif error_code(e) not in SES_THROTTLING_ERRORS:
+                print(f"Failed to send {len(pending)} emails: {e}")
+                return sent
+            retry = pending
+        else:
+            retry = []
+            for i, status in zip(pending, response['Status']):
+                if status['Status'] == 'Success':
+                    sent[i] = True
+                elif status['Status'] in SES_RETRY_STATUSES:
+                    retry.append(i)
+                else:
+                    print(f"Failed to send email: {status['Status']} {status.get('Error', '')}")
+        if not retry:
+            break
+        pending = retry
+        time.sleep(0.1 * 2 ** attempt)
+    logger.debug(f"Sent {sum(sent)} of {len(destinations)} emails in bulk")
+    return sent
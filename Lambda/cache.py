@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by TTLCache.get when a key is absent, so that None can be cached as a value
+MISSING = object()
+
+
+class TTLCache:
+    """Thread safe LRU cache whose entries expire ttl seconds after being set.
+
+    Lives at module level in the Lambda functions so it survives warm invocations.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        now = time.monotonic()
+        # Hits skip the lock: single OrderedDict operations are atomic under the GIL,
+        # which leaves the hit counter best effort when threads race on it
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > now:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                # Evicted by another thread in the meantime; the value is still good
+                pass
+            self.hits += 1
+            return entry[1]
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return MISSING if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time.
+
+    Callers asking for a key whose call is still running wait for it and get its
+    result, or its exception, instead of making the same backend call again.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = {'done': threading.Event(), 'value': None, 'error': None}
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['value']
+
+        try:
+            flight['value'] = function()
+        except Exception as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight['done'].set()
+        return flight['value']
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.shared = 0
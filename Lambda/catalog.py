@@ -0,0 +1,214 @@
+import json
+import mmap
+import random
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+# Binary snapshot written by yelp/dataclean.py (SnapshotWriter), little-endian:
+#
+#   header       SNAPSHOT_HEADER: magic, version, row, string and cuisine counts,
+#                then the offset of every section below
+#   ratings      float64 per row
+#   reviews      uint32 per row
+#   latitudes    float64 per row
+#   longitudes   float64 per row
+#   strings      uint32 offsets into the string data, one more than there are
+#                strings; row r's fields are strings r * 5 to r * 5 + 4 in
+#                SNAPSHOT_FIELDS order, the cuisine names follow the rows
+#   cuisines     (name string, start, count) per cuisine, into partition rows
+#   partition    uint32 rows grouped by cuisine
+#   by id        uint32 rows in business_id order, for binary search
+#   string data  UTF-8
+#
+# Sections start on 8-byte boundaries.
+SNAPSHOT_MAGIC = b'YELPSNAP'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8s4I9Q')
+SNAPSHOT_CUISINE = struct.Struct('<3I')
+SNAPSHOT_FIELDS = ('business_id', 'name', 'address', 'zip_code', 'cuisine')
+
+
+class Catalog:
+    """Restaurant records held in parallel arrays and partitioned by cuisine.
+
+    Built once at cold start from the DynamoDB typed export (yelp/yelp_data.json)
+    or the OpenSearch bulk file (yelp/data.json), so a cuisine lookup is a list
+    index instead of a network call.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.addresses = []
+        self.zip_codes = []
+        self.cuisines = []
+        self.ratings = array('d')
+        self.review_counts = array('l')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.rows = {}
+        self.partitions = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            if file.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC:
+                return SnapshotCatalog(path)
+
+        catalog = cls()
+        with open(path, encoding='utf-8') as file:
+            first = file.read(1)
+            while first.isspace():
+                first = file.read(1)
+            file.seek(0)
+
+            if first == '[':
+                for record in json.load(file):
+                    catalog.add({key: next(iter(value.values())) for key, value in record.items()})
+            else:
+                for line in file:
+                    record = json.loads(line) if line.strip() else None
+                    # Skip the bulk action lines
+                    if record and 'business_id' in record:
+                        catalog.add(record)
+        return catalog
+
+    def add(self, record):
+        business_id = record['business_id']
+        if business_id in self.rows:
+            return
+
+        row = len(self.ids)
+        latitude, longitude = parse_coordinates(record.get('coordinates'))
+        cuisine = normalize_cuisine(record['cuisine'])
+
+        self.ids.append(business_id)
+        self.names.append(record['name'])
+        self.addresses.append(record['address'])
+        self.zip_codes.append(str(record.get('zip_code', '')))
+        self.cuisines.append(cuisine)
+        self.ratings.append(float(record['rating']))
+        self.review_counts.append(int(float(record['number_of_reviews'])))
+        self.latitudes.append(latitude)
+        self.longitudes.append(longitude)
+        self.rows[business_id] = row
+        self.partitions.setdefault(cuisine.lower(), array('l')).append(row)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def record(self, row):
+        # Same shape as the projected yelp-restaurants items LF2 renders
+        return {
+            'business_id': self.ids[row],
+            'name': self.names[row],
+            'rating': self.ratings[row],
+            'number_of_reviews': self.review_counts[row],
+            'address': self.addresses[row]
+        }
+
+    def get(self, business_id):
+        row = self.rows.get(business_id)
+        return None if row is None else self.record(row)
+
+    def sample(self, cuisine, k, rng=random):
+        partition = self.partitions.get(normalize_cuisine(cuisine or '').lower())
+        if not partition:
+            return []
+        return [self.record(row) for row in rng.sample(partition, min(k, len(partition)))]
+
+
+class SnapshotCatalog(Catalog):
+    """Catalog read in place from a memory-mapped snapshot.
+
+    Opening it reads the header and the cuisine table only. The numeric columns
+    are views of the mapping and strings are decoded when a row is used, so a
+    cold start neither parses the file nor copies it onto the heap, and the
+    pages a container never touches are never read.
+    """
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError('Snapshots are little-endian')
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, strings, cuisines, *offsets = SNAPSHOT_HEADER.unpack_from(self._map)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f'{path} is not a version {SNAPSHOT_VERSION} catalog snapshot')
+        ratings, reviews, latitudes, longitudes, string_offsets, table, partition_rows, by_id, data = offsets
+
+        view = memoryview(self._map)
+        self.ratings = view[ratings:ratings + 8 * rows].cast('d')
+        self.review_counts = view[reviews:reviews + 4 * rows].cast('I')
+        self.latitudes = view[latitudes:latitudes + 8 * rows].cast('d')
+        self.longitudes = view[longitudes:longitudes + 8 * rows].cast('d')
+        self._offsets = view[string_offsets:string_offsets + 4 * (strings + 1)].cast('I')
+        self._data = view[data:]
+        self._by_id = view[by_id:by_id + 4 * rows].cast('I')
+
+        self.ids, self.names, self.addresses, self.zip_codes, self.cuisines = (
+            StringColumn(self, field, rows) for field in range(len(SNAPSHOT_FIELDS)))
+        partition_rows = view[partition_rows:partition_rows + 4 * rows].cast('I')
+        self.partitions = {}
+        for i in range(cuisines):
+            name, start, count = SNAPSHOT_CUISINE.unpack_from(self._map, table + i * SNAPSHOT_CUISINE.size)
+            self.partitions[self.string(name).lower()] = partition_rows[start:start + count]
+
+    def string(self, index):
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+    def get(self, business_id):
+        # Binary search over the rows in id order
+        low, high = 0, len(self._by_id)
+        while low < high:
+            middle = (low + high) // 2
+            if self.ids[self._by_id[middle]] < business_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._by_id) and self.ids[self._by_id[low]] == business_id:
+            return self.record(self._by_id[low])
+        return None
+
+
+class StringColumn(Sequence):
+    """One string field of every row of a SnapshotCatalog."""
+
+    def __init__(self, snapshot, field, rows):
+        self.snapshot = snapshot
+        self.field = field
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self.rows))]
+        if not -self.rows <= row < self.rows:
+            raise IndexError(row)
+        return self.snapshot.string((row % self.rows) * len(SNAPSHOT_FIELDS) + self.field)
+
+    def __iter__(self):
+        # Whole-column reads (the geo index's zip codes) skip the per-item checks
+        offsets, data, step = self.snapshot._offsets, self.snapshot._data, len(SNAPSHOT_FIELDS)
+        for index in range(self.field, self.rows * step, step):
+            yield str(data[offsets[index]:offsets[index + 1]], 'utf-8')
+
+
+def normalize_cuisine(cuisine):
+    # The scraper stored cuisines as "Chinese restaurant"
+    cuisine = str(cuisine).strip()
+    if cuisine.lower().endswith(' restaurant'):
+        cuisine = cuisine[:-len(' restaurant')]
+    return cuisine
+
+
+def parse_coordinates(coordinates):
+    try:
+        latitude, longitude = str(coordinates).split(',')
+        return float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return float('nan'), float('nan')
@@ -0,0 +1,49 @@
+import threading
+
+# boto3 is imported on first use so that it is not paid for at import time by
+# code paths that never reach AWS
+_clients = {}
+_overrides = {}
+_thread_local = threading.local()
+_lock = threading.Lock()
+
+
+def client(name):
+    """Memoized boto3 client, shared by every thread and warm invocation."""
+    if name in _overrides:
+        return _overrides[name]
+    instance = _clients.get(name)
+    if instance is None:
+        with _lock:
+            instance = _clients.get(name)
+            if instance is None:
+                import boto3
+                instance = _clients[name] = boto3.client(name)
+    return instance
+
+
+def resource(name):
+    """Memoized boto3 resource. Resources are not thread safe, so each thread gets its own."""
+    if ('resource', name) in _overrides:
+        return _overrides[('resource', name)]
+    resources = getattr(_thread_local, 'resources', None)
+    if resources is None:
+        resources = _thread_local.resources = {}
+    instance = resources.get(name)
+    if instance is None:
+        # Creating from the shared default session is not thread safe either
+        with _lock:
+            import boto3
+            instance = resources[name] = boto3.resource(name)
+    return instance
+
+
+def install(name, instance, kind='client'):
+    # Used by the benchmarks to swap in local stand-ins
+    _overrides[name if kind == 'client' else (kind, name)] = instance
+
+
+def reset():
+    _clients.clear()
+    _overrides.clear()
+    _thread_local.resources = {}
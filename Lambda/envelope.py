@@ -0,0 +1,91 @@
+import json
+
+# Body of the SQS messages LF1 sends to LF2. One message carries a list of
+# requests, each with short keys:
+#
+#   {"v":1,"r":[{"l":"Manhattan","c":"Chinese","n":2,"d":"2024-03-01","t":"19:00","e":"a@b.com"}]}
+VERSION = 1
+
+# (field, key in the body, type, required)
+FIELDS = [
+    ('location', 'l', str, True),
+    ('cuisine', 'c', str, True),
+    ('number_of_people', 'n', int, True),
+    ('dining_date', 'd', str, True),
+    ('dining_time', 't', str, True),
+    ('email', 'e', str, True),
+    ('zip_code', 'z', str, False),
+]
+
+# Message attribute names used before the envelope existed
+LEGACY_ATTRIBUTES = {
+    'location': ('Location', 'location'),
+    'cuisine': ('Cuisine',),
+    'number_of_people': ('NumberOfPeople',),
+    'dining_date': ('DiningDate',),
+    'dining_time': ('DiningTime',),
+    'email': ('email',),
+    'zip_code': ('ZipCode',),
+}
+
+
+class EnvelopeError(ValueError):
+    pass
+
+
+def validate(request, by_key=False):
+    # Reads the body's short keys when by_key is set, field names otherwise
+    validated = {}
+    for field, key, kind, required in FIELDS:
+        value = request.get(key if by_key else field)
+        if value is None or value == '':
+            if required:
+                raise EnvelopeError(f"Missing field: {field}")
+            continue
+        if type(value) is not kind:
+            try:
+                value = kind(value)
+            except (TypeError, ValueError):
+                raise EnvelopeError(f"Invalid value for {field}: {value!r}")
+        validated[field] = value
+    return validated
+
+
+def encode(requests):
+    body = []
+    for request in requests:
+        request = validate(request)
+        body.append({key: request[field] for field, key, _, _ in FIELDS if field in request})
+    return json.dumps({'v': VERSION, 'r': body}, separators=(',', ':'), ensure_ascii=False)
+
+
+def decode(body):
+    try:
+        envelope = json.loads(body)
+    except (TypeError, ValueError):
+        raise EnvelopeError('Message body is not JSON')
+    if not isinstance(envelope, dict) or envelope.get('v') != VERSION:
+        raise EnvelopeError(f"Unsupported envelope version: {envelope.get('v') if isinstance(envelope, dict) else None}")
+    if not isinstance(envelope.get('r'), list):
+        raise EnvelopeError('Envelope has no requests')
+
+    for request in envelope['r']:
+        if not isinstance(request, dict):
+            raise EnvelopeError(f"Request is not an object: {request!r}")
+    return [validate(request, by_key=True) for request in envelope['r']]
+
+
+def from_sqs_message(message):
+    # Messages queued by an older LF1 carry the request in their attributes
+    body = message.get('Body', '')
+    if body.startswith('{'):
+        return decode(body)
+
+    attributes = message.get('MessageAttributes') or {}
+    request = {}
+    for field, names in LEGACY_ATTRIBUTES.items():
+        for name in names:
+            if name in attributes:
+                request[field] = attributes[name]['StringValue']
+                break
+    return [validate(request)]
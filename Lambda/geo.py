@@ -0,0 +1,155 @@
+import math
+
+import numpy as np
+
+from catalog import normalize_cuisine
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Below this many points one vectorized pass beats walking the grid
+BRUTE_FORCE_MAX = 1024
+
+
+def haversine_km(lat, lon, lats, lons):
+    # Great-circle distance from one point to arrays of points
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def closest(rows, distances, k):
+    # Partitioning first keeps a full pass over a large partition from paying for a sort
+    if len(distances) > k:
+        candidates = np.argpartition(distances, k - 1)[:k]
+    else:
+        candidates = np.arange(len(distances))
+    order = candidates[np.argsort(distances[candidates], kind='stable')]
+    return [(int(rows[i]), float(distances[i])) for i in order]
+
+
+class _Grid:
+    """Rows bucketed into square cells, stored contiguously by cell."""
+
+    def __init__(self, rows, cell_i, cell_j):
+        order = np.lexsort((cell_j, cell_i))
+        self.rows = rows[order]
+        cell_i, cell_j = cell_i[order], cell_j[order]
+
+        # Each cell's rows run from one change of cell to the next
+        changes = (np.diff(cell_i) != 0) | (np.diff(cell_j) != 0)
+        starts = np.concatenate(([0], np.flatnonzero(changes) + 1)) if len(self.rows) else np.zeros(0, np.int64)
+        ends = np.append(starts[1:], len(self.rows))
+        self.cells = {(i, j): (start, end) for i, j, start, end in
+                      zip(cell_i[starts].tolist(), cell_j[starts].tolist(), starts.tolist(), ends.tolist())}
+
+        self.size = len(self.rows)
+        if self.size:
+            self.bounds = (int(cell_i.min()), int(cell_i.max()), int(cell_j.min()), int(cell_j.max()))
+
+    def ring(self, ci, cj, r):
+        # Only the part of the ring inside the bounds, so a ring much wider than
+        # the grid costs no more than the grid's own width
+        i_min, i_max, j_min, j_max = self.bounds
+        if r == 0:
+            candidates = [(ci, cj)]
+        else:
+            columns = range(max(cj - r, j_min), min(cj + r, j_max) + 1)
+            candidates = [(i, j) for i in (ci - r, ci + r) if i_min <= i <= i_max for j in columns]
+            rows = range(max(ci - r + 1, i_min), min(ci + r - 1, i_max) + 1)
+            candidates += [(i, j) for j in (cj - r, cj + r) if j_min <= j <= j_max for i in rows]
+        return [self.cells[cell] for cell in candidates if cell in self.cells]
+
+
+class GeoIndex:
+    """Grid index over a Catalog's coordinates, one grid per cuisine.
+
+    nearest() walks rings of cells outwards from the query point and stops once
+    no unvisited cell can hold anything closer than the k-th match so far.
+    Small partitions, and points outside a partition's bounds, are scanned in a
+    single vectorized pass instead.
+    """
+
+    def __init__(self, catalog, cell_km=0.5):
+        self.catalog = catalog
+        self.cell_km = cell_km
+        self.lats = np.asarray(catalog.latitudes, dtype=np.float64)
+        self.lons = np.asarray(catalog.longitudes, dtype=np.float64)
+
+        valid = ~(np.isnan(self.lats) | np.isnan(self.lons))
+        self.ref_lat = float(self.lats[valid].mean()) if valid.any() else 0.0
+        # Cells are square in kilometres around the data's mean latitude
+        self.cell_lat = cell_km / KM_PER_DEGREE
+        self.cell_lon = self.cell_lat / math.cos(math.radians(self.ref_lat))
+
+        rows = np.flatnonzero(valid)
+        cell_i, cell_j = self._cells(self.lats[rows], self.lons[rows])
+        self.grids = {None: _Grid(rows, cell_i, cell_j)}
+        for cuisine, partition in catalog.partitions.items():
+            mask = valid[np.asarray(partition, dtype=np.int64)]
+            part_rows = np.asarray(partition, dtype=np.int64)[mask]
+            i, j = self._cells(self.lats[part_rows], self.lons[part_rows])
+            self.grids[cuisine] = _Grid(part_rows, i, j)
+
+        # Mean position per zip code, in one pass over the rows with coordinates
+        zips, members = np.unique(np.asarray(catalog.zip_codes, dtype=object)[rows].astype(str), return_inverse=True)
+        counts = np.bincount(members, minlength=len(zips))
+        lat_sums = np.bincount(members, weights=self.lats[rows], minlength=len(zips))
+        lon_sums = np.bincount(members, weights=self.lons[rows], minlength=len(zips))
+        self.zip_centroids = {
+            str(zip_code): (float(lat_sums[i] / counts[i]), float(lon_sums[i] / counts[i]))
+            for i, zip_code in enumerate(zips) if zip_code
+        }
+
+    def _cells(self, lats, lons):
+        return np.floor(lats / self.cell_lat).astype(np.int64), np.floor(lons / self.cell_lon).astype(np.int64)
+
+    def resolve(self, point):
+        # A (lat, lon) pair, a "lat,lon" string or a zip code seen in the catalog
+        if isinstance(point, str):
+            if ',' not in point:
+                return self.zip_centroids.get(point.strip())
+            point = point.split(',')
+        try:
+            lat, lon = float(point[0]), float(point[1])
+        except (TypeError, ValueError, IndexError):
+            return None
+        return lat, lon
+
+    def nearest(self, point, k=3, cuisine=None):
+        """Return up to k (row, distance_km) pairs, closest first."""
+        resolved = self.resolve(point)
+        grid = self.grids.get(normalize_cuisine(cuisine).lower() if cuisine else None)
+        if resolved is None or grid is None or grid.size == 0 or k <= 0:
+            return []
+
+        lat, lon = resolved
+        ci, cj = math.floor(lat / self.cell_lat), math.floor(lon / self.cell_lon)
+        i_min, i_max, j_min, j_max = grid.bounds
+        outside = not (i_min <= ci <= i_max and j_min <= cj <= j_max)
+        # From outside the grid (another city) the rings would have to reach across
+        # the whole grid anyway, and cells are only square near the data
+        if grid.size <= BRUTE_FORCE_MAX or outside:
+            return closest(grid.rows, haversine_km(lat, lon, self.lats[grid.rows], self.lons[grid.rows]), k)
+
+        r = 0
+        rows, distances = [], []
+        visited = 0
+        kth = math.inf
+        while True:
+            slices = grid.ring(ci, cj, r)
+            if slices:
+                ring_rows = np.concatenate([grid.rows[start:end] for start, end in slices])
+                rows.append(ring_rows)
+                distances.append(haversine_km(lat, lon, self.lats[ring_rows], self.lons[ring_rows]))
+                visited += len(ring_rows)
+                found = np.concatenate(distances)
+                if len(found) >= k:
+                    kth = np.partition(found, k - 1)[k - 1]
+
+            # Anything beyond ring r is at least r cells away
+            if visited == grid.size or kth <= r * self.cell_km:
+                break
+            r += 1
+
+        return closest(np.concatenate(rows), np.concatenate(distances), k)
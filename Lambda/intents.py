@@ -0,0 +1,87 @@
+import json
+import os
+import re
+
+# Intents whose reply never depends on the conversation, so LF0 can answer them
+# without a Lex round trip. Must match LF1.greeting_intent and LF1.thank_you_intent.
+REPLIES = {
+    'GreetingIntent': 'Hi there, how can I help?',
+    'ThankYouIntent': "You're welcome."
+}
+
+# Sample utterances of those intents in the bot; LEX_BOT_EXPORT replaces them with
+# the ones of an exported bot
+SAMPLE_UTTERANCES = {
+    'GreetingIntent': [
+        'hi', 'hello', 'hey', 'hi there', 'hello there', 'hey there', 'hiya', 'howdy', 'greetings',
+        'good morning', 'good afternoon', 'good evening', 'hi bot', 'hello bot', 'hey bot'
+    ],
+    'ThankYouIntent': [
+        'thanks', 'thank you', 'thanks a lot', 'thanks so much', 'thank you so much', 'thank you very much',
+        'many thanks', 'thx', 'ty', 'cheers', 'appreciate it', 'ok thanks', 'great thanks', 'perfect thanks',
+        'awesome thank you'
+    ]
+}
+
+# 'off' sends every message to Lex
+ENABLED = os.environ.get('LOCAL_INTENTS', 'on') != 'off'
+# Lex (V1) bot export JSON to read the sample utterances from
+BOT_EXPORT_PATH = os.environ.get('LEX_BOT_EXPORT')
+
+
+def normalize(text):
+    # "Hiii there!!" and "hi there" are the same utterance. Repeated letters are
+    # squeezed on both sides, so "hellooo" finds "hello" (as "helo")
+    text = str(text).lower().replace("'", '')
+    text = re.sub(r'[^a-z0-9]+', ' ', text)
+    text = re.sub(r'(.)\1+', r'\1', text)
+    return ' '.join(text.split())
+
+
+class Classifier:
+    """Maps a message to one of the locally answered intents, or to None.
+
+    Only a message that normalizes to the same key as a sample utterance, with
+    or without its spaces ("thankyou"), is answered locally. Anything else, typos included,
+    goes to Lex, which knows the rest of the bot.
+    """
+
+    def __init__(self, utterances, enabled=ENABLED):
+        self.enabled = enabled
+        self.table = {}
+        for intent, samples in utterances.items():
+            for sample in samples:
+                key = normalize(sample)
+                if key:
+                    self.table.setdefault(key, intent)
+                    self.table.setdefault(key.replace(' ', ''), intent)
+
+    def classify(self, text):
+        # Returns the intent or None
+        if not self.enabled:
+            return None
+        key = normalize(text)
+        return self.table.get(key) or self.table.get(key.replace(' ', ''))
+
+
+def load_bot_export(path):
+    # Sample utterances of the locally answered intents in an exported bot;
+    # utterances with slots never match a fixed reply and are left out
+    with open(path) as file:
+        export = json.load(file)
+    resource = export.get('resource', export)
+    utterances = {}
+    for intent in resource.get('intents', []):
+        if intent.get('name') in REPLIES:
+            utterances[intent['name']] = [sample for sample in intent.get('sampleUtterances', []) if '{' not in sample]
+    return utterances
+
+
+def load_classifier(path=BOT_EXPORT_PATH, enabled=ENABLED):
+    utterances = SAMPLE_UTTERANCES
+    if path:
+        try:
+            utterances = load_bot_export(path)
+        except Exception as e:
+            print(f"Could not read the bot export {path}, using the built-in utterances: {e}")
+    return Classifier(utterances, enabled)
@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# LOG_LEVEL=DEBUG also logs every span and the payloads the handlers used to print
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Share of invocations whose metric record is written
+SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1'))
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'DiningConcierge')
+
+# Lambda attaches its handler to the root logger
+logger = logging.getLogger()
+logger.setLevel(LOG_LEVEL)
+
+
+class Recorder:
+    """Count, total and slowest duration of every span name since the last flush.
+
+    Spans finish on worker threads too, so updates take a lock.
+    """
+
+    def __init__(self):
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, ms, ok):
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += ms
+            stats[2] = max(stats[2], ms)
+            stats[3] += 0 if ok else 1
+
+    def drain(self):
+        with self._lock:
+            spans, self.spans = self.spans, {}
+        return spans
+
+
+recorder = Recorder()
+
+
+def record(name, ms, ok=True):
+    recorder.add(name, ms, ok)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({'span': name, 'ms': round(ms, 3), 'ok': ok}))
+
+
+@contextmanager
+def span(name):
+    # Times the block; an exception marks the span as failed and propagates
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        record(name, (time.perf_counter() - start) * 1000, ok)
+
+
+def flush(function, fields=None, rng=random):
+    # Writes the spans of this invocation as one CloudWatch embedded metric format
+    # line, which CloudWatch turns into metrics without any API call. fields adds
+    # other metrics of the invocation as {name: (value, unit)}. Returns the
+    # record, or None when there was nothing to write or it was sampled out.
+    spans = recorder.drain()
+    if not spans or (SAMPLE_RATE < 1 and rng.random() >= SAMPLE_RATE):
+        return None
+
+    entry = {'function': function, 'sample_rate': SAMPLE_RATE}
+    metrics = []
+    for name, (value, unit) in sorted((fields or {}).items()):
+        entry[name] = value
+        metrics.append({'Name': name, 'Unit': unit})
+    for name, (count, total, slowest, errors) in sorted(spans.items()):
+        entry[name + '.ms'] = round(total, 3)
+        entry[name + '.count'] = count
+        metrics.append({'Name': name + '.ms', 'Unit': 'Milliseconds'})
+        metrics.append({'Name': name + '.count', 'Unit': 'Count'})
+        if slowest != total:
+            entry[name + '.max_ms'] = round(slowest, 3)
+        if errors:
+            entry[name + '.errors'] = errors
+            metrics.append({'Name': name + '.errors', 'Unit': 'Count'})
+    entry['_aws'] = {
+        'Timestamp': int(time.time() * 1000),
+        'CloudWatchMetrics': [{'Namespace': NAMESPACE, 'Dimensions': [['function']], 'Metrics': metrics}]
+    }
+    print(json.dumps(entry, separators=(',', ':')))
+    return entry
+
+
+def invocation(function, fields=None):
+    # Decorates a lambda_handler: times it and flushes its spans when it returns.
+    # fields, if given, is called after the handler for the extra metrics of flush.
+    def decorate(handler):
+        @wraps(handler)
+        def wrapper(event, context):
+            try:
+                with span('handler'):
+                    return handler(event, context)
+            finally:
+                flush(function, fields() if fields else None)
+        return wrapper
+    return decorate
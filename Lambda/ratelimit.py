@@ -0,0 +1,33 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` sends per second, shared by every thread of a container.
+
+    acquire(n) takes n tokens at once and sleeps off any deficit, so a bulk call for
+    50 recipients waits as long as 50 single calls would have. The default capacity
+    of 1 spaces sends out, so no one-second window sees more than `rate` of them.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Going into debt instead of waiting for a full bucket keeps requests
+            # larger than the capacity possible
+            self.tokens -= tokens
+            wait_for = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait_for
+        if wait_for:
+            time.sleep(wait_for)
+        return wait_for
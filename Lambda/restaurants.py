@@ -0,0 +1,190 @@
+import os
+import time
+import clients
+import metrics
+from cache import TTLCache, MISSING
+
+logger = metrics.logger
+
+# Restaurant records from yelp-restaurants and their rows in the suggestion email.
+# LF2 renders the email it sends, and LF1 re-renders previous suggestions from the
+# ids kept in previous-recs.
+
+RESTAURANT_TABLE = 'yelp-restaurants'
+# Only the attributes format_email_body renders
+RESTAURANT_FIELDS = ['business_id', 'name', 'rating', 'number_of_reviews', 'address']
+
+# Restaurant records rarely change, so they are kept across warm invocations
+restaurant_cache = TTLCache(
+    maxsize=int(os.environ.get('RESTAURANT_CACHE_SIZE', '2048')),
+    ttl=int(os.environ.get('RESTAURANT_CACHE_TTL', '3600'))
+)
+
+
+def fetch_restaurants(restaurant_ids):
+    restaurants = {}
+    missing = []
+
+    for restaurant_id in restaurant_ids:
+        cached = restaurant_cache.get(restaurant_id)
+        if cached is MISSING:
+            if restaurant_id not in missing:
+                missing.append(restaurant_id)
+        else:
+            restaurants[restaurant_id] = cached
+
+    if missing:
+        for item in batch_get_restaurants(missing):
+            restaurant_cache.set(item['business_id'], item)
+            restaurants[item['business_id']] = item
+
+    for restaurant_id in restaurant_ids:
+        if restaurant_id not in restaurants:
+            logger.warning(f"No item found with id: {restaurant_id}")
+
+    return [restaurants[id] for id in restaurant_ids if id in restaurants]
+
+
+def batch_get_restaurants(restaurant_ids, max_attempts=4):
+    # 'name' is a DynamoDB reserved word, so every field goes through a placeholder
+    names = {'#f%d' % i: field for i, field in enumerate(RESTAURANT_FIELDS)}
+    request = {
+        RESTAURANT_TABLE: {
+            'Keys': [{'business_id': id} for id in restaurant_ids],
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names
+        }
+    }
+
+    # Errors propagate: LF2 leaves the message on the queue rather than sending an
+    # email without its restaurants
+    items = []
+    for attempt in range(max_attempts):
+        with metrics.span('dynamodb.batch_get_item'):
+            response = clients.resource('dynamodb').batch_get_item(RequestItems=request)
+
+        items.extend(response.get('Responses', {}).get(RESTAURANT_TABLE, []))
+
+        request = response.get('UnprocessedKeys')
+        if not request:
+            return items
+        # Throttled keys come back unprocessed; back off before asking again
+        time.sleep(0.05 * 2 ** attempt)
+
+    raise RuntimeError(f"{len(request[RESTAURANT_TABLE]['Keys'])} restaurants still unprocessed "
+                       f"after {max_attempts} attempts")
+
+
+EMAIL_TABLE_HEADER = """<tr style="background-color: #f2f2f2;">
+    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Name</th>
+    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Rating</th>
+    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Review Count</th>
+    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Address</th>
+    """
+
+EMAIL_ROW = """
+                <tr>
+                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{name}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{rating}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{number_of_reviews}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{address}</td>
+                </tr>
+        """
+
+EMAIL_FOOTER = "</table></p></body></html>"
+
+# Rendered table rows by business_id; restaurants look the same in every email.
+# The template data of a row is kept the same way for bulk sends.
+email_row_cache = TTLCache(maxsize=restaurant_cache.maxsize, ttl=restaurant_cache.ttl)
+template_row_cache = TTLCache(maxsize=restaurant_cache.maxsize, ttl=restaurant_cache.ttl)
+
+# Quotes and brackets left from the scraped address lists
+ADDRESS_CLEANUP = str.maketrans('', '', '\'[]"')
+
+
+def clean_address(address):
+    # Scraped addresses can still look like "['40 W 56th St', 'New York, NY 10019']"
+    return str(address).translate(ADDRESS_CLEANUP)
+
+
+def render_restaurant_row(data):
+    business_id = data.get('business_id')
+    row = email_row_cache.get(business_id) if business_id else MISSING
+    if row is MISSING:
+        row = EMAIL_ROW.format(
+            name=data['name'],
+            rating=data['rating'],
+            number_of_reviews=data['number_of_reviews'],
+            address=clean_address(data['address'])
+        )
+        if business_id:
+            email_row_cache.set(business_id, row)
+    return row
+
+
+def render_email_header(user_details):
+    return f'''<html><head></head><body><p>Here are the requested suggestions for the following details: <br> Location: {user_details['Location']} <br> 
+    Number of people: {user_details['Number_people']} <br>
+    Cuisine: {user_details['Cuisine']} <br>
+    Date: {user_details['Date']} <br>
+    Time: {user_details['Time']} <br>
+    </p><p><table style="width: 100%; border-collapse: collapse; border: 1px solid #ddd;">>'''
+
+
+def user_details(search):
+    # An envelope request and a previous-recs record use the same slot names
+    return {
+        'Location': search['location'],
+        'Cuisine': search['cuisine'],
+        'Number_people': search['number_of_people'],
+        'Date': search['dining_date'],
+        'Time': search['dining_time']
+    }
+
+
+def format_email_body(restaurants_info, user_details):
+    parts = [render_email_header(user_details), EMAIL_TABLE_HEADER]
+    parts.extend(render_restaurant_row(data) for data in restaurants_info)
+    parts.append(EMAIL_FOOTER)
+    return ''.join(parts)
+
+
+# The same email as an SES template, for bulk sends: the header and rows are the
+# ones above with Handlebars placeholders, unescaped like the rendered email
+EMAIL_TEMPLATE_HTML = ''.join([
+    render_email_header({'Location': '{{{location}}}', 'Number_people': '{{{number_of_people}}}',
+                         'Cuisine': '{{{cuisine}}}', 'Date': '{{{date}}}', 'Time': '{{{time}}}'}),
+    EMAIL_TABLE_HEADER,
+    '{{#each restaurants}}',
+    EMAIL_ROW.format(name='{{{name}}}', rating='{{{rating}}}', number_of_reviews='{{{number_of_reviews}}}',
+                     address='{{{address}}}'),
+    '{{/each}}',
+    EMAIL_FOOTER
+])
+
+
+def email_template_data(restaurants_info, user_details):
+    # Values are strings so they print exactly as format_email_body prints them
+    return {
+        'location': str(user_details['Location']),
+        'number_of_people': str(user_details['Number_people']),
+        'cuisine': str(user_details['Cuisine']),
+        'date': str(user_details['Date']),
+        'time': str(user_details['Time']),
+        'restaurants': [template_row(data) for data in restaurants_info]
+    }
+
+
+def template_row(data):
+    business_id = data.get('business_id')
+    row = template_row_cache.get(business_id) if business_id else MISSING
+    if row is MISSING:
+        row = {
+            'name': str(data['name']),
+            'rating': str(data['rating']),
+            'number_of_reviews': str(data['number_of_reviews']),
+            'address': clean_address(data['address'])
+        }
+        if business_id:
+            template_row_cache.set(business_id, row)
+    return row
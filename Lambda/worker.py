@@ -0,0 +1,215 @@
+# Runs the LF2 consumer as a long-lived process (a container or an instance)
+# instead of one short poll per Lambda invocation. Several pollers long-poll the
+# queue, so a message is picked up as soon as it arrives and an idle queue costs
+# one receive per poller every WORKER_WAIT_TIME_SECONDS. Messages still being
+# processed have their visibility timeout extended, and SIGTERM or Ctrl-C stops
+# receiving and lets the batches in hand finish before exiting.
+#
+#   python Lambda/worker.py --pollers 4 --wait-time 20
+
+import argparse
+import os
+import signal
+import threading
+import time
+
+import clients
+import metrics
+import LF2
+
+# SQS waits at most 20 seconds for a message to arrive
+WAIT_TIME_SECONDS = int(os.environ.get('WORKER_WAIT_TIME_SECONDS', '20'))
+POLLERS = int(os.environ.get('WORKER_POLLERS', '2'))
+# Set on every receive; a message still in hand when half of it is left gets it again
+VISIBILITY_TIMEOUT = int(os.environ.get('WORKER_VISIBILITY_TIMEOUT', '60'))
+# change_message_visibility_batch takes at most 10 entries
+MAX_VISIBILITY_ENTRIES = 10
+# Seconds covered by each metric record; batches of all pollers go in the same one
+METRICS_INTERVAL = int(os.environ.get('WORKER_METRICS_INTERVAL', '60'))
+
+
+class VisibilityKeeper:
+    """Extends the visibility timeout of the messages being processed.
+
+    One thread serves every poller: each tick extends the messages whose
+    timeout is more than half gone, so a slow batch is not handed to another
+    poller (and its emails sent twice) while it is still being worked on.
+    """
+
+    def __init__(self, queue_url, visibility_timeout):
+        self.queue_url = queue_url
+        self.visibility_timeout = visibility_timeout
+        self.extended = 0
+        self._visible_until = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add(self, messages):
+        visible_until = time.monotonic() + self.visibility_timeout
+        with self._lock:
+            for message in messages:
+                self._visible_until[message['ReceiptHandle']] = visible_until
+
+    def remove(self, messages):
+        with self._lock:
+            for message in messages:
+                self._visible_until.pop(message['ReceiptHandle'], None)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='visibility', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        margin = self.visibility_timeout / 2
+        while not self._stopped.wait(margin / 2):
+            try:
+                self.extend(margin)
+            except Exception as e:
+                # The next tick tries again; until then SQS may redeliver
+                print(f"Failed to extend message visibility: {e}")
+
+    def extend(self, margin):
+        now = time.monotonic()
+        with self._lock:
+            due = [handle for handle, visible_until in self._visible_until.items() if visible_until - now < margin]
+        for start in range(0, len(due), MAX_VISIBILITY_ENTRIES):
+            handles = due[start:start + MAX_VISIBILITY_ENTRIES]
+            entries = [{'Id': str(i), 'ReceiptHandle': handle, 'VisibilityTimeout': self.visibility_timeout}
+                       for i, handle in enumerate(handles)]
+            with metrics.span('sqs.change_message_visibility_batch'):
+                response = clients.client('sqs').change_message_visibility_batch(QueueUrl=self.queue_url,
+                                                                                 Entries=entries)
+            failed = {int(entry['Id']) for entry in response.get('Failed', [])}
+            visible_until = time.monotonic() + self.visibility_timeout
+            with self._lock:
+                for i, handle in enumerate(handles):
+                    # Deleted in the meantime, or already handed out again
+                    if i not in failed and handle in self._visible_until:
+                        self._visible_until[handle] = visible_until
+                        self.extended += 1
+
+
+class Worker:
+    """Pollers that receive batches and hand them to LF2.handle_messages until stopped."""
+
+    def __init__(self, pollers=POLLERS, wait_time=WAIT_TIME_SECONDS, visibility_timeout=VISIBILITY_TIMEOUT,
+                 queue_url=None, metrics_interval=METRICS_INTERVAL):
+        self.pollers = pollers
+        self.wait_time = wait_time
+        self.visibility_timeout = visibility_timeout
+        self.metrics_interval = metrics_interval
+        self.queue_url = queue_url or LF2.queue_url
+        self.keeper = VisibilityKeeper(self.queue_url, visibility_timeout)
+        self.stats = {'receives': 0, 'empty_receives': 0, 'received': 0, 'processed': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._flusher = None
+
+    def start(self):
+        self.keeper.start()
+        self._flusher = threading.Thread(target=self.flush_metrics, name='metrics', daemon=True)
+        self._flusher.start()
+        self._threads = [threading.Thread(target=self.poll, name=f'poller-{i}') for i in range(self.pollers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        # Pollers finish their current receive and batch, then exit
+        self._stopping.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        self.keeper.stop()
+        if self._flusher is not None:
+            self._flusher.join()
+        # Whatever the last interval left
+        metrics.flush('LF2-worker')
+
+    def run(self):
+        self.start()
+        # Sleeping in the main thread keeps it free to run the signal handlers
+        while not self._stopping.wait(1):
+            pass
+        self.join()
+
+    def poll(self):
+        ses_client = clients.client('ses')
+        while not self._stopping.is_set():
+            try:
+                with metrics.span('sqs.receive_message'):
+                    response = clients.client('sqs').receive_message(
+                        QueueUrl=self.queue_url,
+                        MaxNumberOfMessages=LF2.MAX_MESSAGES,
+                        WaitTimeSeconds=self.wait_time,
+                        VisibilityTimeout=self.visibility_timeout,
+                        MessageAttributeNames=['All']
+                    )
+            except Exception as e:
+                print(f"Failed to receive messages: {e}")
+                self._stopping.wait(1)
+                continue
+
+            # Messages received while stopping are still processed: they are already invisible
+            messages = response.get('Messages', [])
+            self.count(receives=1, empty_receives=0 if messages else 1, received=len(messages))
+            if not messages:
+                continue
+
+            self.keeper.add(messages)
+            try:
+                with metrics.span('batch'):
+                    failures = LF2.handle_messages(messages, ses_client, self.queue_url)
+            except Exception as e:
+                print(f"Failed to process a batch of {len(messages)} messages: {e}")
+                failures = messages
+            finally:
+                self.keeper.remove(messages)
+            self.count(processed=len(messages) - len(failures), failed=len(failures))
+
+    def flush_metrics(self):
+        # The spans are recorded in one place for the whole process, so a record per
+        # batch would take in the spans of other pollers' batches still running.
+        # One thread writes a record per interval instead.
+        while not self._stopping.wait(self.metrics_interval):
+            metrics.flush('LF2-worker')
+
+    def count(self, **counts):
+        with self._stats_lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consume the suggestion queue continuously with long polling')
+    parser.add_argument('--pollers', type=int, default=POLLERS)
+    parser.add_argument('--wait-time', type=int, default=WAIT_TIME_SECONDS, help='long-poll seconds, at most 20')
+    parser.add_argument('--visibility-timeout', type=int, default=VISIBILITY_TIMEOUT)
+    parser.add_argument('--queue-url', default=LF2.queue_url)
+    parser.add_argument('--metrics-interval', type=int, default=METRICS_INTERVAL, help='seconds per metric record')
+    args = parser.parse_args()
+
+    worker = Worker(args.pollers, args.wait_time, args.visibility_timeout, args.queue_url, args.metrics_interval)
+
+    def shutdown(signum, frame):
+        print(f"Received signal {signum}, finishing the batches in hand")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    worker.run()
+    print("{received} messages received, {processed} processed, {failed} failed, "
+          "{empty_receives} of {receives} receives empty; {extended} visibility extensions".format(
+              extended=worker.keeper.extended, **worker.stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# Indexing throughput of yelp/bulk_index.py against a local OpenSearch _bulk
+# stand-in, compared with posting the whole file as one request, plus runs where
+# the stand-in throttles concurrent requests and rejects items.
+#
+#   python benchmarks/bench_bulk_index.py --docs 20000 --doc-latency 0.0002
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'yelp'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+import bulk_index
+from stubs import LocalBulkServer
+
+
+def write_input(path, count):
+    # Repeats the documents of data.json with fresh ids until there are count of them
+    with open(os.path.join(ROOT, 'yelp', 'data.json')) as file:
+        documents = [json.loads(line) for line in file if line.strip() and not line.startswith('{"index"')]
+    with open(path, 'w') as file:
+        for i in range(count):
+            doc_id = 'bench-%07d' % i
+            file.write(json.dumps({'index': {'_index': 'restaurants', '_id': doc_id}}) + '\n')
+            file.write(json.dumps(dict(documents[i % len(documents)], business_id=doc_id)) + '\n')
+
+
+def single_request(path, server):
+    # What indexing looked like before: the whole file in one _bulk call
+    start = time.perf_counter()
+    with open(path, 'rb') as file:
+        response = requests.post(server.base_url + '/_bulk', data=file.read(),
+                                 headers={'Content-Type': 'application/x-ndjson'})
+    elapsed = time.perf_counter() - start
+    indexed = sum(1 for item in response.json()['items'] if item['index']['status'] < 300)
+    return {'indexed': indexed, 'failed': 0, 'retries': 0, 'seconds': elapsed, 'docs_per_second': indexed / elapsed}
+
+
+def chunked(path, server, workers, max_docs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return bulk_index.bulk_index(path, server.base_url, None, workers, max_docs=max_docs)
+
+
+def report(label, server, result):
+    stored = len(server.indices.get('restaurants', {}))
+    print(f"{label:<28} {result['docs_per_second']:9.0f} docs/s  requests={server.requests:<5} "
+          f"throttled={server.throttled:<4} rejected={server.rejected:<5} retries={result['retries']:<4} "
+          f"failed={result['failed']:<3} stored={stored}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=10000)
+    parser.add_argument('--doc-latency', type=float, default=0.0002, help='server seconds per document')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-docs', type=int, default=500)
+    parser.add_argument('--reject-rate', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bulk.ndjson')
+        write_input(path, args.docs)
+
+        runs = [
+            ('single request', {}, lambda server: single_request(path, server)),
+            ('chunked, 1 worker', {}, lambda server: chunked(path, server, 1, args.max_docs)),
+            (f'chunked, {args.workers} workers', {}, lambda server: chunked(path, server, args.workers, args.max_docs)),
+            ('throttled (2 in flight)', {'max_inflight': 2},
+             lambda server: chunked(path, server, args.workers, args.max_docs)),
+            (f'{args.reject_rate:.0%} items rejected', {'reject_rate': args.reject_rate},
+             lambda server: chunked(path, server, args.workers, args.max_docs)),
+        ]
+        for label, options, run in runs:
+            server = LocalBulkServer(doc_latency=args.doc_latency, **options).start()
+            try:
+                report(label, server, run(server))
+            finally:
+                server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Throughput of yelp/push_to_dynamo.py against a local DynamoDB stand-in with
+# per-call latency and throttling, and a crash-and-resume run that checks the
+# checkpoint picks up where the load stopped.
+#
+#   python benchmarks/bench_bulk_load.py --items 20000 --latency 0.01 --unprocessed 0.1
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'yelp'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import push_to_dynamo
+from stubs import LocalDynamoDBClient
+
+
+def write_input(path, count):
+    # Repeats the real export with fresh ids until it has count items
+    with open(os.path.join(ROOT, 'yelp', 'yelp_data.json')) as file:
+        records = json.load(file)
+    with open(path, 'w') as file:
+        file.write('[\n')
+        for i in range(count):
+            record = dict(records[i % len(records)], business_id={'S': 'bench-%07d' % i})
+            file.write(('' if i == 0 else ',\n') + json.dumps(record))
+        file.write('\n]\n')
+
+
+def load(path, client, workers, checkpoint=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return push_to_dynamo.load_data_to_dynamodb(path, client, workers=workers, checkpoint_path=checkpoint)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds per batch_write_item call')
+    parser.add_argument('--unprocessed', type=float, default=0.05, help='share of items returned unprocessed')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'items.json')
+        write_input(path, args.items)
+
+        for workers in (1, args.workers):
+            client = LocalDynamoDBClient(args.latency, args.unprocessed)
+            result = load(path, client, workers)
+            print(f"workers={workers:<3} {result['items_per_second']:9.0f} items/s  "
+                  f"calls={client.calls['batch_write_item']:<6} stored={len(client.tables['yelp-restaurants'])}")
+
+        checkpoint = os.path.join(directory, 'checkpoint.json')
+        crashing = LocalDynamoDBClient(args.latency, args.unprocessed, fail_after=args.items // 50)
+        try:
+            load(path, crashing, args.workers, checkpoint)
+        except ConnectionError:
+            pass
+        with open(checkpoint) as file:
+            saved = json.load(file)['items']
+
+        resumed = LocalDynamoDBClient(args.latency, args.unprocessed)
+        resumed.tables = crashing.tables
+        result = load(path, resumed, args.workers, checkpoint)
+        print(f"resume   crashed after {saved} items, resumed and wrote {result['written']} more, "
+              f"stored={len(resumed.tables['yelp-restaurants'])}/{args.items}")
+
+
+if __name__ == '__main__':
+    main()
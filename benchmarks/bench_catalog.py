@@ -0,0 +1,75 @@
+# Per-request latency of LF2.find_restaurants in remote mode (OpenSearch +
+# DynamoDB stand-ins with injected latency) and embedded catalog mode.
+#
+#   python benchmarks/bench_catalog.py --requests 2000 --latency 0.003
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clients
+import LF2
+from catalog import Catalog
+from stubs import LocalTable, LocalDynamoDB, load_yelp_items
+
+CUISINES = ['Chinese', 'Indian', 'Italian']
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def run(label, requests):
+    timings = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(requests):
+            start = time.perf_counter()
+            LF2.find_restaurants(CUISINES[i % len(CUISINES)])
+            timings.append(time.perf_counter() - start)
+
+    print(f"{label:<9} p50={percentile(timings, 50) * 1e6:9.1f}us  p95={percentile(timings, 95) * 1e6:9.1f}us  "
+          f"p99={percentile(timings, 99) * 1e6:9.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.002, help='seconds added to every remote call')
+    parser.add_argument('--catalog', default=os.path.join(ROOT, 'yelp', 'yelp_data.json'))
+    args = parser.parse_args()
+
+    items = load_yelp_items(args.catalog)
+    by_cuisine = defaultdict(list)
+    for item in items.values():
+        by_cuisine[item['cuisine']].append(item['business_id'])
+
+    def es_query_for_cuisine(cuisine_type, k=LF2.SUGGESTION_COUNT):
+        time.sleep(args.latency)
+        ids = by_cuisine.get(cuisine_type, [])
+        return random.sample(ids, min(k, len(ids)))
+
+    dynamodb = LocalDynamoDB([LocalTable('yelp-restaurants', 'business_id', items=items)], args.latency)
+    LF2.es_query_for_cuisine = es_query_for_cuisine
+    clients.install('dynamodb', dynamodb, kind='resource')
+
+    LF2.catalog = None
+    LF2.restaurant_cache.clear()
+    run('remote', args.requests)
+
+    start = time.perf_counter()
+    LF2.catalog = Catalog.load(args.catalog)
+    print(f"catalog of {len(LF2.catalog)} restaurants loaded in {(time.perf_counter() - start) * 1000:.1f}ms")
+    run('embedded', args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# A burst of messages for a few cuisines through LF2 with no top lists, so every
+# request falls back to OpenSearch (a real local HTTP server). Compares one search
+# per request with the shared candidate pools: searches made, coalescing ratio,
+# time per batch, and how many requests still got a suggestion set of their own.
+#
+#   python benchmarks/bench_coalescing.py --messages 300 --latency 0.01
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_lf2_batch
+import LF2
+from bench_pipeline import Pipeline
+
+
+def run(label, mode, pool_size, messages, latency):
+    pipeline = Pipeline(latency, top_lists=False)
+    LF2.PROCESSING_MODE = mode
+    LF2.CUISINE_POOL_SIZE = pool_size
+    bench_lf2_batch.enqueue(pipeline.sqs, messages)
+
+    batches, stats = [], {}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            while pipeline.sqs.queue:
+                start = time.perf_counter()
+                response = LF2.lambda_handler({}, None)
+                batches.append(time.perf_counter() - start)
+                stats = json.loads(response['body'])['cuisinePool']
+        searches = pipeline.search.requests
+    finally:
+        pipeline.stop()
+
+    # previous-recs keeps the suggested ids of every request, one user each
+    suggestions = [tuple(sorted(item['restaurant_ids'])) for item in pipeline.dynamodb.tables['previous-recs'].items.values()]
+    distinct = len(set(suggestions)) / len(suggestions) if suggestions else 0.0
+    print(f"{label:<14} {mode:<8} searches={searches:<5} coalescing_ratio={stats.get('coalescing_ratio', 0):6.3f} "
+          f"{sum(batches) / len(batches) * 1000:8.1f} ms/batch  distinct suggestion sets={distinct:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds added to every external call')
+    args = parser.parse_args()
+
+    pool_size = LF2.CUISINE_POOL_SIZE
+    for mode in ('threads', 'async'):
+        run('per request', mode, 0, args.messages, args.latency)
+        run('shared pools', mode, pool_size, args.messages, args.latency)
+
+
+if __name__ == '__main__':
+    main()
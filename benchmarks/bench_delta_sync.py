@@ -0,0 +1,120 @@
+# Re-publishing a catalog where a few percent of the rows changed: a full reload
+# (push_to_dynamo.py plus bulk_index.py over every record) against
+# yelp/delta_sync.py, which only writes the inserts, updates and deletes. Both
+# run against the local DynamoDB and OpenSearch _bulk stand-ins.
+#
+#   python benchmarks/bench_delta_sync.py --items 20000 --changed 0.03
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'yelp'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bulk_index
+import delta_sync
+import push_to_dynamo
+from stubs import LocalBulkServer, LocalDynamoDBClient
+
+
+def base_records(count):
+    with open(os.path.join(ROOT, 'yelp', 'yelp_data.json')) as file:
+        records = json.load(file)
+    return [dict(records[i % len(records)], business_id={'S': 'bench-%07d' % i}) for i in range(count)]
+
+
+def rescrape(records, changed, rng):
+    # A new scrape: every timestamp moves, and `changed` of the rows are split
+    # between rating updates, new restaurants and closed ones
+    share = int(len(records) * changed / 3)
+    updated = set(rng.sample(range(len(records)), share))
+    closed = set(rng.sample(sorted(set(range(len(records))) - updated), share))
+    scraped = []
+    for i, record in enumerate(records):
+        if i in closed:
+            continue
+        record = dict(record, insertedAtTimestamp={'S': '2026-10-18 09:00:00.%06d' % i})
+        if i in updated:
+            record['rating'] = {'N': str(round(float(record['rating']['N']) - 0.1, 1))}
+        scraped.append(record)
+    for i in range(share):
+        scraped.append(dict(records[i], business_id={'S': 'new-%07d' % i}))
+    return scraped
+
+
+def write_export(path, records):
+    with open(path, 'w') as file:
+        json.dump(records, file)
+
+
+def full_publish(path, client, server, workers):
+    with open(path) as file:
+        actions = [(json.dumps({'index': {'_index': 'restaurants', '_id': item['business_id']['S']}}),
+                    json.dumps(delta_sync.to_document(item))) for item in json.load(file)]
+    push_to_dynamo.load_data_to_dynamodb(path, client, workers=workers)
+    bulk_index.index_actions(actions, server.base_url, None, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--changed', type=float, default=0.03, help='share of rows inserted, updated or deleted')
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds per batch_write_item call')
+    parser.add_argument('--doc-latency', type=float, default=0.0002, help='OpenSearch seconds per document')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        first, second = os.path.join(directory, 'first.json'), os.path.join(directory, 'second.json')
+        manifest = os.path.join(directory, 'manifest.json')
+        records = base_records(args.items)
+        write_export(first, records)
+        scraped = rescrape(records, args.changed, rng)
+        write_export(second, scraped)
+        expected = {record['business_id']['S'] for record in scraped}
+
+        for label in ('full reload', 'delta sync'):
+            client = LocalDynamoDBClient(args.latency)
+            server = LocalBulkServer(doc_latency=args.doc_latency).start()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    # Both stores start out holding the first scrape
+                    delta_sync.delta_sync(first, manifest if label == 'delta sync' else None, client,
+                                          host=server.base_url, auth=None, workers=args.workers)
+                client.writes = 0
+                server.reset_stats()
+                dynamo_before = client.calls['batch_write_item']
+
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if label == 'full reload':
+                        full_publish(second, client, server, args.workers)
+                    else:
+                        stats = delta_sync.delta_sync(second, manifest, client, host=server.base_url,
+                                                      auth=None, workers=args.workers)
+                elapsed = time.perf_counter() - start
+            finally:
+                server.stop()
+
+            dynamo = set(client.tables['yelp-restaurants'])
+            search = set(server.indices['restaurants'])
+            print(f"{label:<12} {elapsed:6.2f}s  dynamo writes={client.writes:<6} "
+                  f"calls={client.calls['batch_write_item'] - dynamo_before:<5} "
+                  f"bulk requests={server.requests:<4} sent={server.bytes_received / 1e6:5.2f} MB  "
+                  f"stale rows={len(dynamo - expected)}/{len(search - expected)}  "
+                  f"missing={len(expected - dynamo)}/{len(expected - search)}")
+        print(f"delta sync: {stats['inserts']} inserts, {stats['updates']} updates, {stats['deletes']} deletes, "
+              f"{stats['writes_avoided']} writes avoided")
+
+
+if __name__ == '__main__':
+    main()
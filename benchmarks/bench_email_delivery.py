@@ -0,0 +1,77 @@
+# Draining a burst of queued requests through LF2 with one send_email per request
+# against bulk sends through the stored SES template, on a local SES stand-in that
+# counts calls and request bytes. The bulk runs also check that the emails rendered
+# from the template match the ones send_email carried, and show the rate limiter
+# against an SES account limit.
+#
+#   python benchmarks/bench_email_delivery.py --messages 200 --latency 0.02
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clients
+import LF2
+from bench_lf2_batch import enqueue, install_stubs
+from ratelimit import RateLimiter
+from stubs import LocalSES
+
+
+def drain(label, args, delivery, max_send_rate=None, limiter_rate=1000.0):
+    sqs, _, _ = install_stubs(0.0)
+    ses = LocalSES(args.latency, max_send_rate)
+    clients.install('ses', ses)
+    LF2.EMAIL_DELIVERY = delivery
+    LF2._email_template_ready = False
+    LF2._email_template_retry_at = 0.0
+    LF2.ses_rate_limiter = RateLimiter(limiter_rate)
+    LF2.es_query_for_cuisine = lambda cuisine, k=LF2.SUGGESTION_COUNT: sorted(ids_by_cuisine[cuisine])[:k]
+    # The same suggestions for every run, so the emails of both modes can be compared
+    LF2.CUISINE_POOL_SIZE = 0
+    enqueue(sqs, args.messages)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while sqs.queue or sqs.in_flight:
+            LF2.lambda_handler({}, None)
+            # Messages whose email failed come back after the visibility timeout
+            sqs.requeue_in_flight()
+    elapsed = time.perf_counter() - start
+
+    calls = sum(count for name, count in ses.calls.items() if name.startswith('send'))
+    print(f"{label:<26} {elapsed:6.2f}s  emails={len(ses.sent):<5} send calls={calls:<5} "
+          f"bytes/email={ses.bytes_sent / len(ses.sent):6.0f}  throttled calls={ses.throttled:<3} "
+          f"limiter wait={LF2.ses_rate_limiter.waited:5.2f}s")
+    return sorted(message['Body']['Html']['Data'] for _, message in ses.sent)
+
+
+ids_by_cuisine = {}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per SES call')
+    parser.add_argument('--send-rate', type=float, default=50, help='SES account limit, emails per second')
+    args = parser.parse_args()
+
+    from stubs import load_yelp_items
+    for item in load_yelp_items(os.path.join(ROOT, 'yelp', 'yelp_data.json')).values():
+        ids_by_cuisine.setdefault(item['cuisine'], []).append(item['business_id'])
+
+    single = drain('send_email per request', args, 'single')
+    bulk = drain('bulk templated', args, 'bulk')
+    print(f"bulk emails identical to send_email ones: {single == bulk}")
+    drain(f'bulk, {args.send_rate:.0f}/s limit, no limiter', args, 'bulk', args.send_rate)
+    drain(f'bulk, {args.send_rate:.0f}/s limit, limiter', args, 'bulk', args.send_rate, args.send_rate)
+
+
+if __name__ == '__main__':
+    main()
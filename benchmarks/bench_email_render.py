@@ -0,0 +1,73 @@
+# Render cost per email: the old string-concatenation format_email_body against
+# the current one, which joins cached restaurant rows.
+#
+#   python benchmarks/bench_email_render.py --emails 20000
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import LF2
+from restaurants import email_row_cache
+from stubs import load_yelp_items
+
+USER_DETAILS = {'Location': 'Manhattan', 'Cuisine': 'Chinese', 'Number_people': 2, 'Date': '2024-03-01', 'Time': '19:00'}
+
+
+def legacy_format_email_body(restaurants_info, user_details):
+    html = """<tr style="background-color: #f2f2f2;">
+    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Name</th>
+    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Rating</th>
+    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Review Count</th>
+    <th style="padding: 8px; text-align: left; border-bottom: 1px solid #ddd;">Address</th>
+    """
+
+    for data in restaurants_info:
+        address = data['address'].replace("\'", '').replace('[', '').replace(']', '').replace('"', '')
+        html += f"""
+                <tr>
+                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{data['name']}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{data['rating']}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{data['number_of_reviews']}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #ddd;">{address}</td>
+                </tr>
+        """
+
+    html_1 = f'''<html><head></head><body><p>Here are the requested suggestions for the following details: <br> Location: {user_details['Location']} <br> 
+    Number of people: {user_details['Number_people']} <br>
+    Cuisine: {user_details['Cuisine']} <br>
+    Date: {user_details['Date']} <br>
+    Time: {user_details['Time']} <br>
+    </p><p><table style="width: 100%; border-collapse: collapse; border: 1px solid #ddd;">>'''
+    html_2 = "</table></p></body></html>"
+
+    return html_1 + html + html_2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--emails', type=int, default=20000)
+    args = parser.parse_args()
+
+    items = list(load_yelp_items(os.path.join(ROOT, 'yelp', 'yelp_data.json')).values())
+    rng = random.Random(1)
+    picks = [rng.sample(items, 3) for _ in range(1000)]
+
+    for restaurants in picks:
+        assert LF2.format_email_body(restaurants, USER_DETAILS) == legacy_format_email_body(restaurants, USER_DETAILS)
+
+    for label, render in [('legacy', legacy_format_email_body), ('cached', LF2.format_email_body)]:
+        seconds = timeit.timeit(lambda: [render(restaurants, USER_DETAILS) for restaurants in picks],
+                                number=max(1, args.emails // len(picks)))
+        print(f"{label:<7} {seconds / args.emails * 1e6:6.2f}us/email")
+    print(f"row cache: {email_row_cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Size and parse time of one LF1 -> LF2 request as the old six message
+# attributes versus the versioned envelope body. Parse time starts from the
+# message as SQS returns it on the wire (JSON protocol), because the attributes
+# cost botocore decoding work that the body does not.
+#
+#   python benchmarks/bench_envelope.py --iterations 100000
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+
+import envelope
+
+REQUEST = {
+    'location': 'Manhattan',
+    'cuisine': 'Chinese',
+    'number_of_people': '2',
+    'dining_date': '2024-03-01',
+    'dining_time': '19:00',
+    'email': 'someone@example.com'
+}
+
+
+def legacy_message():
+    names = {'location': 'location', 'cuisine': 'Cuisine', 'number_of_people': 'NumberOfPeople',
+             'dining_date': 'DiningDate', 'dining_time': 'DiningTime', 'email': 'email'}
+    attributes = {
+        names[field]: {'DataType': 'Number' if field == 'number_of_people' else 'String', 'StringValue': value}
+        for field, value in REQUEST.items()
+    }
+    return {'Body': 'Restaurant slots', 'MessageAttributes': attributes}
+
+
+def message_size(message):
+    # SQS bills the body plus each attribute's name, data type and value
+    size = len(message['Body'].encode())
+    for name, attribute in message.get('MessageAttributes', {}).items():
+        size += len(name.encode()) + len(attribute['DataType'].encode()) + len(attribute['StringValue'].encode())
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=50000)
+    args = parser.parse_args()
+
+    legacy = legacy_message()
+    current = {'Body': envelope.encode([REQUEST])}
+    batched = {'Body': envelope.encode([REQUEST] * 10)}
+
+    for label, message, requests in [('legacy', legacy, 1), ('envelope', current, 1), ('envelope10', batched, 10)]:
+        wire = json.dumps({'Messages': [dict(message, MessageId='id', ReceiptHandle='rh', MD5OfBody='0' * 32)]})
+        seconds = timeit.timeit(lambda: envelope.from_sqs_message(json.loads(wire)['Messages'][0]), number=args.iterations)
+        print(f"{label:<11} bytes/request={message_size(message) / requests:6.1f}  "
+              f"parse={seconds / args.iterations / requests * 1e6:6.2f}us/request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Compares the old search path (fresh connection, 100 full documents, sampling in
+# Python) with es_query_for_cuisine (pooled session, seeded random score, k ids)
+# against a local OpenSearch stand-in.
+#
+#   python benchmarks/bench_es_query.py --queries 500
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+import LF2
+from stubs import LocalSearchServer, load_yelp_items
+
+CUISINES = ['Chinese', 'Indian', 'Italian', 'Japanese', 'Korean', 'Mexican']
+
+
+def legacy_query(es_url, cuisine_type):
+    query = {"query": {"match": {"cuisine": cuisine_type}}, "size": 100}
+    response = requests.get(es_url, headers={'Content-Type': 'application/json'}, data=json.dumps(query))
+    ids = [res['_source']['business_id'] for res in response.json()['hits']['hits']]
+    return random.sample(ids, min(3, len(ids)))
+
+
+def run(label, server, queries, query):
+    server.reset_stats()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(queries):
+            query(CUISINES[i % len(CUISINES)])
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<8} {elapsed / queries * 1000:7.3f} ms/query  connections={server.connections:<5} "
+          f"bytes/query={server.bytes_sent / queries:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every search')
+    args = parser.parse_args()
+
+    items = load_yelp_items(os.path.join(ROOT, 'yelp', 'yelp_data.json'))
+    documents = [{k: (float(v) if k in ('rating', 'number_of_reviews') else v) for k, v in item.items()}
+                 for item in items.values()]
+    server = LocalSearchServer(documents, args.latency).start()
+    LF2.ES_URL = server.url
+
+    try:
+        run('legacy', server, args.queries, lambda cuisine: legacy_query(server.url, cuisine))
+        run('pooled', server, args.queries, lambda cuisine: LF2.es_query_for_cuisine(cuisine))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Per-query time of GeoIndex.nearest against a brute-force vectorized haversine
+# over the whole cuisine partition, checking both return the same distances.
+#
+#   python benchmarks/bench_geo.py --queries 5000 --catalog yelp/data.json
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+
+import numpy as np
+from catalog import Catalog
+from geo import GeoIndex, haversine_km
+
+# Roughly Manhattan
+LAT_RANGE = (40.70, 40.88)
+LON_RANGE = (-74.02, -73.91)
+
+
+def brute_force(catalog, lats, lons, point, k, cuisine):
+    rows = np.asarray(catalog.partitions[cuisine.lower()])
+    distances = haversine_km(point[0], point[1], lats[rows], lons[rows])
+    order = np.argsort(distances)[:k]
+    return [(int(rows[i]), float(distances[i])) for i in order]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--catalog', default=os.path.join(ROOT, 'yelp', 'yelp_data.json'))
+    args = parser.parse_args()
+
+    catalog = Catalog.load(args.catalog)
+    start = time.perf_counter()
+    index = GeoIndex(catalog)
+    print(f"indexed {len(catalog)} restaurants in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    rng = random.Random(7)
+    cuisines = list(catalog.partitions)
+    queries = [((rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)), rng.choice(cuisines)) for _ in range(args.queries)]
+    lats, lons = np.asarray(catalog.latitudes), np.asarray(catalog.longitudes)
+
+    for label, nearest in [('grid', lambda p, c: index.nearest(p, args.k, c)),
+                           ('brute', lambda p, c: brute_force(catalog, lats, lons, p, args.k, c))]:
+        start = time.perf_counter()
+        for point, cuisine in queries:
+            nearest(point, cuisine)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<6} {elapsed / args.queries * 1e6:8.1f}us/query")
+
+    # Points far from every restaurant (another city) must not walk rings across the gap
+    far = [((rng.uniform(33.9, 34.2), rng.uniform(-118.4, -118.1)), rng.choice(cuisines)) for _ in range(200)]
+    start = time.perf_counter()
+    for point, cuisine in far:
+        index.nearest(point, args.k, cuisine)
+    print(f"far    {(time.perf_counter() - start) / len(far) * 1e6:8.1f}us/query")
+
+    mismatches = sum(
+        not np.allclose([d for _, d in index.nearest(p, args.k, c)], [d for _, d in brute_force(catalog, lats, lons, p, args.k, c)])
+        for p, c in queries + far
+    )
+    print(f"mismatches: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Wall-clock time per LF2 batch with the sequential path (one worker thread), the
+# thread pool and the asyncio mode, for both email delivery modes, against the
+# local stand-ins of bench_lf2_batch.py.
+#
+#   python benchmarks/bench_lf2_async.py --messages 200 --latency 0.01
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_lf2_batch
+import LF2
+
+MODES = [
+    # (label, LF2_PROCESSING_MODE, LF2_MAX_WORKERS)
+    ('sequential', 'threads', 1),
+    ('threads', 'threads', None),
+    ('async', 'async', None)
+]
+
+
+def run(mode, workers, delivery, messages, latency):
+    sqs, ses, _ = bench_lf2_batch.install_stubs(latency)
+    LF2.PROCESSING_MODE = mode
+    LF2.MAX_WORKERS = workers
+    # The pool is sized on first use and kept, so drop the one from the last run
+    LF2._batch_executor = None
+    LF2.EMAIL_DELIVERY = delivery
+    LF2._email_template_ready = False
+    LF2._email_template_retry_at = 0.0
+    bench_lf2_batch.enqueue(sqs, messages)
+
+    batches = []
+    processed = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        while sqs.queue:
+            start = time.perf_counter()
+            response = LF2.lambda_handler({}, None)
+            batches.append(time.perf_counter() - start)
+            processed += json.loads(response['body'])['processed']
+    return {'batches': len(batches), 'processed': processed, 'emails': len(ses.sent),
+            'ms_per_batch': sum(batches) / len(batches) * 1000, 'seconds': sum(batches)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds added to every external call')
+    parser.add_argument('--workers', type=int, default=LF2.MAX_WORKERS, help='thread pool size of the threads mode')
+    args = parser.parse_args()
+
+    for delivery in ('single', 'bulk'):
+        baseline = None
+        for label, mode, workers in MODES:
+            result = run(mode, workers or args.workers, delivery, args.messages, args.latency)
+            baseline = baseline or result['ms_per_batch']
+            print(f"{delivery:<6} {label:<10} batches={result['batches']:<4} processed={result['processed']:<5} "
+                  f"emails={result['emails']:<5} {result['ms_per_batch']:8.1f} ms/batch "
+                  f"({baseline / result['ms_per_batch']:4.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Measures LF2 throughput (messages per invocation and per second) against local
+# stand-ins, comparing the old one-message-per-poll settings with batched polling.
+#
+#   python benchmarks/bench_lf2_batch.py --messages 200 --latency 0.01
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clients
+import envelope
+import LF2
+from ratelimit import RateLimiter
+from stubs import LocalSQS, LocalTable, LocalDynamoDB, LocalSES, load_yelp_items
+
+CUISINES = ['Chinese', 'Indian', 'Italian']
+
+
+def enqueue(sqs, count):
+    for i in range(count):
+        request = {
+            'location': 'Manhattan',
+            'cuisine': CUISINES[i % len(CUISINES)],
+            'number_of_people': 2,
+            'dining_date': '2024-03-01',
+            'dining_time': '19:00',
+            'email': 'user%d@example.com' % i
+        }
+        sqs.send_message(QueueUrl=LF2.queue_url, MessageBody=envelope.encode([request]))
+
+
+def install_stubs(latency, queue_url=None):
+    items = load_yelp_items(os.path.join(ROOT, 'yelp', 'yelp_data.json'))
+    by_cuisine = defaultdict(list)
+    for item in items.values():
+        by_cuisine[item['cuisine']].append(item['business_id'])
+
+    def es_query_for_cuisine(cuisine_type, k=LF2.SUGGESTION_COUNT):
+        time.sleep(latency)
+        ids = by_cuisine.get(cuisine_type, [])
+        return random.sample(ids, min(k, len(ids)))
+
+    sqs = LocalSQS(latency, queue_url or LF2.queue_url)
+    ses = LocalSES(latency)
+    dynamodb = LocalDynamoDB([
+        LocalTable('yelp-restaurants', 'business_id', latency, items),
+        LocalTable('previous-recs', 'email', latency)
+    ], latency)
+
+    clients.install('sqs', sqs)
+    clients.install('ses', ses)
+    clients.install('dynamodb', dynamodb, kind='resource')
+    LF2.es_query_for_cuisine = es_query_for_cuisine
+    LF2.restaurant_cache.clear()
+    LF2.cuisine_pool_cache.clear()
+    LF2.cuisine_pool_loads.reset()
+    # Polling is what is measured here, not the SES sending quota
+    LF2.ses_rate_limiter = RateLimiter(1e9)
+    return sqs, ses, dynamodb
+
+
+def run(label, messages, latency, max_messages, workers):
+    sqs, ses, dynamodb = install_stubs(latency)
+    LF2.MAX_MESSAGES = max_messages
+    LF2.MAX_WORKERS = workers
+    # The pool is sized on first use and kept, so drop the one from the last run
+    LF2._batch_executor = None
+    enqueue(sqs, messages)
+
+    invocations = 0
+    start = time.perf_counter()
+    # Keep the per-message prints out of the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        while sqs.queue:
+            LF2.lambda_handler({}, None)
+            invocations += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<10} invocations={invocations:<5} msgs/invocation={messages / invocations:6.2f} "
+          f"msgs/s={messages / elapsed:8.1f} deleted={sqs.deleted}")
+    print(f"{'':<10} sqs_calls={dict(sqs.calls)} dynamodb_calls={dict(dynamodb.calls)} "
+          f"restaurant_cache={LF2.restaurant_cache.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds added to every stubbed call')
+    parser.add_argument('--workers', type=int, default=LF2.MAX_WORKERS)
+    args = parser.parse_args()
+
+    run('single', args.messages, args.latency, 1, 1)
+    run('batched', args.messages, args.latency, 10, args.workers)
+
+
+if __name__ == '__main__':
+    main()
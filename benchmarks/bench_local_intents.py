@@ -0,0 +1,88 @@
+# Sends a mix of chat messages through LF0.lambda_handler with every message going
+# to Lex and with greetings and thanks answered locally. Lex is a stand-in that
+# adds --latency per post_text. Reports p50/p95 per message, Lex calls, and any
+# message the classifier answered that should have gone to Lex, or the reverse.
+#
+#   python benchmarks/bench_local_intents.py --messages 2000 --latency 0.03
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clients
+import intents
+import LF0
+from stubs import LocalLex
+
+# (message, intent LF0 should answer locally or None for Lex)
+MESSAGES = [
+    ('hi', 'GreetingIntent'), ('Hello!', 'GreetingIntent'), ('hey there', 'GreetingIntent'),
+    ('Hiii', 'GreetingIntent'), ('helo', 'GreetingIntent'), ('hellooo', 'GreetingIntent'),
+    ('Good morning', 'GreetingIntent'),
+    ('thanks', 'ThankYouIntent'), ('Thank you!', 'ThankYouIntent'), ('thx', 'ThankYouIntent'),
+    ('thank you so much', 'ThankYouIntent'), ('thankyou', 'ThankYouIntent'), ('ok thanks!', 'ThankYouIntent'),
+    ('I need some restaurant suggestions', None), ('hi, I want chinese food', None), ('Manhattan', None),
+    ('Chinese', None), ('4', None), ('tomorrow', None), ('7 pm', None), ('user@example.com', None),
+    ('yes', None), ('no', None), ('thanks, but can you suggest italian instead', None),
+    ('help', None), ('hey can you find me a place to eat', None), ('Indian', None),
+    # Close to a sample utterance but not one; Lex decides
+    ('they', None), ('hell', None), ('thanksgiving dinner', None), ('hi5', None)
+]
+
+
+def run(label, enabled, messages, latency):
+    lex = LocalLex(latency)
+    clients.reset()
+    clients.install('lex-runtime', lex)
+    LF0.classifier = intents.Classifier(intents.SAMPLE_UTTERANCES, enabled)
+
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for text, _ in messages:
+            event = {'body': {'messages': [{'type': 'unstructured', 'unstructured': {'text': text}}]}}
+            start = time.perf_counter()
+            LF0.lambda_handler(event, None)
+            durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    print(f"{label:<12} p50={durations[len(durations) // 2]:7.2f}ms  p95={durations[int(len(durations) * 0.95)]:7.2f}ms  "
+          f"lex calls={lex.calls['post_text']:<5} of {len(messages)} messages")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.03, help='seconds added to every post_text')
+    parser.add_argument('--greeting-share', type=float, default=0.6,
+                        help='share of the traffic that is a greeting or a thank you')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    trivial = [pair for pair in MESSAGES if pair[1]]
+    others = [pair for pair in MESSAGES if not pair[1]]
+    messages = [rng.choice(trivial if rng.random() < args.greeting_share else others) for _ in range(args.messages)]
+
+    run('all to Lex', False, messages, args.latency)
+    run('local', True, messages, args.latency)
+
+    classifier = intents.Classifier(intents.SAMPLE_UTTERANCES)
+    start = time.perf_counter()
+    for text, _ in MESSAGES * 100:
+        classifier.classify(text)
+    print(f"classify: {(time.perf_counter() - start) / (len(MESSAGES) * 100) * 1e6:.1f} us per message")
+    for text, expected in MESSAGES:
+        intent = classifier.classify(text)
+        if intent != expected:
+            print(f"  {text!r}: expected {expected}, got {intent}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Measures what the timing spans cost and what LF2 writes to its logs per
+# invocation, at LOG_LEVEL=INFO (one metric record) and DEBUG (every span and
+# payload), and prints where the time of the run went according to the spans.
+#
+#   python benchmarks/bench_metrics.py --messages 200 --latency 0.005
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_lf2_batch
+import LF2
+import metrics
+
+
+def span_overhead(iterations):
+    # Cost of an empty span against an empty block, in microseconds
+    start = time.perf_counter()
+    for _ in range(iterations):
+        pass
+    empty = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with metrics.span('overhead'):
+            pass
+    spans = time.perf_counter() - start
+    metrics.recorder.drain()
+    return (spans - empty) / iterations * 1e6
+
+
+def run(level, messages, latency):
+    sqs, _, _ = bench_lf2_batch.install_stubs(latency)
+    bench_lf2_batch.enqueue(sqs, messages)
+
+    # Lambda sends both stdout and the root logger to CloudWatch Logs
+    logs = io.StringIO()
+    handler = logging.StreamHandler(logs)
+    metrics.logger.addHandler(handler)
+    metrics.logger.setLevel(level)
+    records, invocations = [], 0
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            while sqs.queue:
+                LF2.lambda_handler({}, None)
+                invocations += 1
+    finally:
+        metrics.logger.removeHandler(handler)
+        metrics.logger.setLevel(metrics.LOG_LEVEL)
+    elapsed = time.perf_counter() - start
+
+    for line in stdout.getvalue().splitlines():
+        if line.startswith('{') and '"_aws"' in line:
+            records.append(json.loads(line))
+    written = len(stdout.getvalue().encode('utf-8')) + len(logs.getvalue().encode('utf-8'))
+    return {'invocations': invocations, 'seconds': elapsed, 'bytes_per_invocation': written / invocations,
+            'records': records}
+
+
+def breakdown(records):
+    # Total milliseconds and count of every span over the run
+    totals = {}
+    for record in records:
+        for key, value in record.items():
+            if key.endswith('.ms'):
+                name = key[:-len('.ms')]
+                ms, count = totals.get(name, (0.0, 0))
+                totals[name] = (ms + value, count + record[name + '.count'])
+    return sorted(totals.items(), key=lambda pair: pair[1][0], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds added to every external call')
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"span overhead: {span_overhead(args.iterations):.2f} us")
+    for level in ('INFO', 'DEBUG'):
+        result = run(level, args.messages, args.latency)
+        print(f"LOG_LEVEL={level:<6} invocations={result['invocations']:<4} {result['seconds']:.2f}s  "
+              f"log bytes/invocation={result['bytes_per_invocation']:8.0f}  metric records={len(result['records'])}")
+
+    for name, (ms, count) in breakdown(result['records']):
+        print(f"  {name:<34} {ms:9.1f} ms  {count:5d} calls  {ms / count:7.2f} ms/call")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+# End-to-end run of the recommendation pipeline against local stand-ins: LF1 takes
+# synthetic Lex turns (validation, fulfillment onto the queue, and repeat users
+# whose previous suggestions are re-sent), then LF2 drains the queue. Every
+# stand-in adds the configured latency per call and OpenSearch is a real HTTP
+# server. Reports p50/p95/p99, throughput and external calls per stage, and can
+# save the results and compare them with a saved baseline.
+#
+#   python benchmarks/bench_pipeline.py --users 200 --save baseline.json
+#   python benchmarks/bench_pipeline.py --users 200 --baseline baseline.json
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.join(ROOT, 'yelp'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clients
+import LF1
+import LF2
+import restaurants
+from ratelimit import RateLimiter
+from stubs import LocalDynamoDB, LocalSearchServer, LocalSES, LocalSQS, LocalTable, load_yelp_items
+
+CUISINES = ['Chinese', 'Indian', 'Italian']
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+class Pipeline:
+    """The stand-ins every stage talks to, wired into clients and LF2."""
+
+    def __init__(self, latency, top_lists):
+        data = os.path.join(ROOT, 'yelp', 'yelp_data.json')
+        items = load_yelp_items(data)
+        tables = [
+            LocalTable('yelp-restaurants', 'business_id', latency, items),
+            LocalTable('previous-recs', 'email', latency)
+        ]
+        if top_lists:
+            import build_top_lists
+            lists = build_top_lists.build_top_lists(data)
+            tables.append(LocalTable(LF2.TOP_LISTS_TABLE, 'list_key', latency, {item['list_key']: item for item in lists}))
+
+        self.sqs = LocalSQS(latency)
+        self.ses = LocalSES(latency)
+        self.dynamodb = LocalDynamoDB(tables, latency)
+        self.search = LocalSearchServer(items.values(), latency).start()
+
+        clients.reset()
+        clients.install('sqs', self.sqs)
+        clients.install('ses', self.ses)
+        clients.install('dynamodb', self.dynamodb, kind='resource')
+        LF2.ES_URL = self.search.url
+        LF2._email_template_ready = False
+        LF2._email_template_retry_at = 0.0
+        # The SES quota is a deployment setting, not something to measure here
+        LF2.ses_rate_limiter = RateLimiter(1e9)
+        for cache in (LF1.previous_search_cache, LF2.top_list_cache, LF2.cuisine_pool_cache,
+                      restaurants.restaurant_cache, restaurants.email_row_cache,
+                      restaurants.template_row_cache):
+            cache.clear()
+        LF2.cuisine_pool_loads.reset()
+
+    def calls(self):
+        counts = Counter()
+        for name, service in (('sqs', self.sqs), ('ses', self.ses), ('dynamodb', self.dynamodb)):
+            counts.update({f'{name}.{method}': n for method, n in service.calls.items()})
+        for table in self.dynamodb.tables.values():
+            counts.update({f'dynamodb.{table.name}.{method}': n for method, n in table.calls.items()})
+        counts['opensearch.search'] = self.search.requests
+        return counts
+
+    def stop(self):
+        self.search.stop()
+
+
+def lex_event(source, email, cuisine, rng):
+    date = (datetime.date.today() + datetime.timedelta(days=rng.randint(1, 30))).isoformat()
+    return {
+        'userId': email,
+        'invocationSource': source,
+        'sessionAttributes': {},
+        'currentIntent': {
+            'name': 'DiningSuggestionsIntent',
+            'slots': {
+                'Location': 'Manhattan',
+                'Cuisine': cuisine,
+                'NumberOfPeople': str(rng.randint(1, 8)),
+                'DiningDate': date,
+                'DiningTime': '%02d:%02d' % (rng.randint(11, 22), rng.choice([0, 15, 30, 45])),
+                'email': email
+            }
+        }
+    }
+
+
+def percentile(ordered, p):
+    # Nearest rank
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def measure(pipeline, invoke, events):
+    # invoke(event) runs one handler invocation and returns how many items it handled
+    durations, handled = [], 0
+    before = pipeline.calls()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for event in events:
+            began = time.perf_counter()
+            handled += invoke(event)
+            durations.append((time.perf_counter() - began) * 1000)
+    elapsed = time.perf_counter() - start
+
+    external = pipeline.calls()
+    external.subtract(before)
+    durations.sort()
+    return {
+        'invocations': len(durations),
+        'items': handled,
+        'mean_ms': round(sum(durations) / len(durations), 3) if durations else 0.0,
+        'p50_ms': round(percentile(durations, 50), 3),
+        'p95_ms': round(percentile(durations, 95), 3),
+        'p99_ms': round(percentile(durations, 99), 3),
+        'items_per_second': round(handled / elapsed, 1) if elapsed else 0.0,
+        'calls_per_item': {call: round(n / handled, 3) for call, n in sorted(external.items()) if n and handled}
+    }
+
+
+def drain(pipeline):
+    # One LF2 invocation per event until the queue is empty
+    while pipeline.sqs.queue:
+        yield None
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    LF2.random.seed(args.seed)
+    pipeline = Pipeline(args.latency, not args.no_top_lists)
+    users = ['user%d@example.com' % i for i in range(args.users)]
+
+    def lf1(event):
+        LF1.lambda_handler(event, None)
+        return 1
+
+    def lf2(_):
+        return json.loads(LF2.lambda_handler({}, None)['body'])['processed']
+
+    try:
+        # Each new user validates the slots, then fulfils and lands on the queue
+        turns = [lex_event(source, email, CUISINES[i % len(CUISINES)], rng)
+                 for i, email in enumerate(users) for source in ('DialogCodeHook', 'FulfillmentCodeHook')]
+        repeats = [lex_event('DialogCodeHook', email, CUISINES[0], rng) for email in rng.sample(users, len(users) // 2)]
+        stages = {
+            'lf1_new_request': measure(pipeline, lf1, turns),
+            'lf2_drain': measure(pipeline, lf2, drain(pipeline))
+        }
+        # Half the users come back in a later conversation, after their "no previous
+        # search" cache entries expired, and get their suggestions again
+        LF1.previous_search_cache.clear()
+        stages['lf1_previous_search'] = measure(pipeline, lf1, repeats)
+        emails = len(pipeline.ses.sent)
+    finally:
+        pipeline.stop()
+
+    return {
+        'config': {'users': args.users, 'latency': args.latency, 'top_lists': not args.no_top_lists,
+                   'seed': args.seed, 'python': platform.python_version(),
+                   'date': datetime.datetime.now().isoformat(timespec='seconds')},
+        'emails_sent': emails,
+        'stages': stages
+    }
+
+
+def report(results):
+    print(f"{results['config']['users']} users, {results['config']['latency'] * 1000:g} ms per external call, "
+          f"{results['emails_sent']} emails sent")
+    for name, stage in results['stages'].items():
+        print(f"{name:<20} invocations={stage['invocations']:<5} items={stage['items']:<5} "
+              f"p50={stage['p50_ms']:8.2f}ms p95={stage['p95_ms']:8.2f}ms p99={stage['p99_ms']:8.2f}ms "
+              f"{stage['items_per_second']:8.1f} items/s")
+        print(f"{'':<20} " + '  '.join(f"{call}={n:g}" for call, n in stage['calls_per_item'].items()))
+
+
+def compare(results, baseline, tolerance, min_ms):
+    # Latency may grow by the tolerance (and at least min_ms) before it counts;
+    # calls per item are deterministic for a given seed, so any growth counts
+    regressions = []
+    for name, stage in results['stages'].items():
+        before = baseline['stages'].get(name)
+        if before is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if stage[metric] > before[metric] * (1 + tolerance) and stage[metric] - before[metric] > min_ms:
+                regressions.append(f"{name} {metric}: {before[metric]:.2f} -> {stage[metric]:.2f}")
+        for call, n in stage['calls_per_item'].items():
+            if n > before['calls_per_item'].get(call, 0) + 0.001:
+                regressions.append(f"{name} {call} per item: {before['calls_per_item'].get(call, 0):g} -> {n:g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds added to every external call')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-top-lists', action='store_true', help='leave out restaurant-top-lists so LF2 searches')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='results JSON to compare against; exits with 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative latency growth')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='latency growth below this is noise')
+    args = parser.parse_args()
+
+    results = run(args)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['config']['users'] != args.users or baseline['config']['latency'] != args.latency:
+            print("warning: the baseline was run with different --users or --latency")
+        regressions = compare(results, baseline, args.tolerance, args.min_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Size and capacity cost of a previous-recs item: the rendered HTML email LF2
+# used to store against the compact record of slots and restaurant ids. Also
+# checks that the email LF1 re-renders from the record matches the one LF2 sent,
+# and times the LF1 lookup with a cold and a warm restaurant cache.
+#
+#   python benchmarks/bench_previous_recs.py --searches 300
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import sys
+import time
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clients
+import LF1
+import LF2
+import restaurants
+from stubs import LocalDynamoDB, LocalSES, LocalTable, load_yelp_items
+
+CUISINES = ['Chinese', 'Indian', 'Italian']
+
+
+def attribute_size(value):
+    # DynamoDB's item size rules: UTF-8 bytes for strings, about one byte per two
+    # digits plus one for numbers, three bytes plus one per element for lists
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (int, float, Decimal)):
+        digits = len(str(value).replace('.', '').replace('-', '').lstrip('0')) or 1
+        return math.ceil(digits / 2) + 1
+    if isinstance(value, list):
+        return 3 + sum(attribute_size(element) + 1 for element in value)
+    raise TypeError(type(value))
+
+
+def item_size(item):
+    return sum(len(name.encode('utf-8')) + attribute_size(value) for name, value in item.items())
+
+
+def capacity(size):
+    # Eventually consistent reads cost half a unit per 4 KB, writes one unit per 1 KB
+    return math.ceil(size / 4096) * 0.5, math.ceil(size / 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--searches', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.002, help='seconds per DynamoDB call')
+    args = parser.parse_args()
+
+    items = load_yelp_items(os.path.join(ROOT, 'yelp', 'yelp_data.json'))
+    previous = LocalTable('previous-recs', 'email', args.latency)
+    dynamodb = LocalDynamoDB([LocalTable('yelp-restaurants', 'business_id', args.latency, items), previous],
+                             args.latency)
+    ses = LocalSES()
+    clients.install('dynamodb', dynamodb, kind='resource')
+    clients.install('ses', ses)
+    LF2.top_list_cache.clear()
+    ids_by_cuisine = {}
+    for item in items.values():
+        ids_by_cuisine.setdefault(item['cuisine'], []).append(item['business_id'])
+    LF2.es_query_for_cuisine = lambda cuisine, k=LF2.SUGGESTION_COUNT: ids_by_cuisine[cuisine][:k]
+    # Every search takes the next ids of the rotation below
+    LF2.CUISINE_POOL_SIZE = 0
+
+    sent_by_lf2, legacy_sizes = {}, []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(args.searches):
+            request = {'location': 'Manhattan', 'cuisine': CUISINES[i % len(CUISINES)], 'number_of_people': 2 + i % 4,
+                       'dining_date': '2026-10-%02d' % (1 + i % 28), 'dining_time': '19:30',
+                       'email': 'user%d@example.com' % i}
+            ids_by_cuisine[request['cuisine']].append(ids_by_cuisine[request['cuisine']].pop(0))
+            LF2.process_request(request, ses)
+            html = ses.sent[-1][1]['Body']['Html']['Data']
+            sent_by_lf2[request['email']] = html
+            legacy_sizes.append(item_size({'email': request['email'], 'location': 'Manhattan',
+                                           'cuisine': request['cuisine'], 'restaurants': html}))
+
+    compact_sizes = [item_size(item) for item in previous.items.values()]
+    for label, sizes in (('rendered HTML', legacy_sizes), ('compact record', compact_sizes)):
+        average = sum(sizes) / len(sizes)
+        read_units, write_units = capacity(max(sizes))
+        print(f"{label:<15} avg item {average:7.0f} B  max {max(sizes):5d} B  "
+              f"read units/lookup={read_units:.1f}  write units/save={write_units}")
+
+    for label, warm in (('LF1 cold', False), ('LF1 warm', True)):
+        LF1.previous_search_cache.clear()
+        restaurants.restaurant_cache.clear()
+        restaurants.email_row_cache.clear()
+        restaurants.template_row_cache.clear()
+        ses.sent.clear()
+        mismatched = 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for email, html in sent_by_lf2.items():
+                if not warm:
+                    restaurants.restaurant_cache.clear()
+                LF1.send_restaurant_suggestions_email(LF1.checkPreviousSearches(email))
+                mismatched += ses.sent[-1][1]['Body']['Html']['Data'] != html
+        elapsed = time.perf_counter() - start
+        print(f"{label:<15} {elapsed / len(sent_by_lf2) * 1000:6.2f} ms/lookup  re-rendered emails differing "
+              f"from the original: {mismatched}")
+
+
+if __name__ == '__main__':
+    main()
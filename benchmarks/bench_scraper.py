@@ -0,0 +1,82 @@
+# Crawl time of yelp/yelp_data_scrape.py against a local mock of the Yelp search
+# endpoint: one worker against several under the same token-bucket rate, plus an
+# interrupted crawl that is resumed from its checkpoint.
+#
+#   python benchmarks/bench_scraper.py --latency 0.05 --rate 20
+
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'yelp'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import yelp_data_scrape
+from stubs import LocalYelpServer
+
+
+def csv_ids(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return [row['business_id'] for row in csv.DictReader(file, delimiter='|')]
+
+
+def crawl(server, directory, name, workers, rate):
+    output = os.path.join(directory, name + '.csv')
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = yelp_data_scrape.scrape_yelp(output, workers=workers, rate=rate,
+                                              checkpoint_path=os.path.join(directory, name + '.checkpoint.json'),
+                                              api_key='bench', api_host=server.base_url)
+    return output, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per search request')
+    parser.add_argument('--rate', type=float, default=20, help='token bucket requests per second')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    # The mock throttles a little above the bucket rate, so 429s mean the bucket leaked
+    server = LocalYelpServer(latency=args.latency, max_qps=int(args.rate * 1.5) + 1).start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for workers in (1, args.workers):
+                server.throttled = 0
+                output, result = crawl(server, directory, 'run%d' % workers, workers, args.rate)
+                ids = csv_ids(output)
+                print(f"workers={workers:<3} {result['seconds']:6.2f}s  pages={result['pages']:<4} rows={len(ids)} "
+                      f"unique={len(set(ids))} throttled={server.throttled}")
+
+            # Interrupt a crawl after 20 pages, then resume it
+            fetch_page = yelp_data_scrape.fetch_page
+            calls = []
+
+            def failing_fetch_page(*fetch_args):
+                calls.append(fetch_args)
+                if len(calls) > 20:
+                    raise KeyboardInterrupt
+                return fetch_page(*fetch_args)
+
+            yelp_data_scrape.fetch_page = failing_fetch_page
+            try:
+                crawl(server, directory, 'resume', args.workers, args.rate)
+            except KeyboardInterrupt:
+                pass
+            yelp_data_scrape.fetch_page = fetch_page
+            before = len(set(csv_ids(os.path.join(directory, 'resume.csv'))))
+
+            output, result = crawl(server, directory, 'resume', args.workers, args.rate)
+            ids = csv_ids(output)
+            print(f"resume   interrupted with {before} rows, resumed with {result['pages']} pages, "
+                  f"rows={len(ids)} unique={len(set(ids))}")
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Cold start of LF2 in embedded mode with the catalog as the DynamoDB typed
+# export, the bulk NDJSON and the binary snapshot, all written by
+# yelp/dataclean.py from the scraped CSV (repeated --copies times with fresh ids
+# for a larger catalog). Each format is measured in a fresh interpreter: file
+# size, the time to import LF2 (which loads the catalog), first lookups, the
+# first request with a zip code (which builds the geo index), and the resident
+# memory the import added.
+#
+#   python benchmarks/bench_snapshot.py --copies 20
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'yelp'))
+
+import dataclean
+
+FORMATS = [('typed json', 'yelp_data.json'), ('bulk ndjson', 'data.json'), ('snapshot', 'yelp_data.snap')]
+
+
+def resident_kb():
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(path):
+    sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+    os.environ['CATALOG_MODE'] = 'embedded'
+    os.environ['CATALOG_PATH'] = path
+
+    before = resident_kb()
+    start = time.perf_counter()
+    import LF2
+    load_ms = (time.perf_counter() - start) * 1000
+    catalog = LF2.catalog
+    rss_kb = resident_kb() - before
+    start = time.perf_counter()
+    for cuisine in ('Chinese', 'Indian', 'Italian'):
+        catalog.sample(cuisine, 3)
+    catalog.get(catalog.ids[len(catalog) // 2])
+    lookup_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    LF2.find_restaurants('Chinese', near='10019')
+    near_ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({'rows': len(catalog), 'load_ms': load_ms, 'lookup_ms': lookup_ms, 'near_ms': near_ms,
+                      'rss_kb': rss_kb}))
+
+
+def write_files(directory, copies):
+    # The CSV repeated with suffixed ids, so dataclean keeps every copy
+    source = os.path.join(directory, 'yelp_data.csv')
+    with open(os.path.join(ROOT, 'yelp', 'yelp_data.csv'), newline='', encoding='utf-8') as file:
+        rows = list(csv.reader(file, delimiter='|'))
+    with open(source, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter='|')
+        for copy in range(copies):
+            for row in rows:
+                writer.writerow(row if copy == 0 or not row or row[0] == 'business_id' else [f'{row[0]}-{copy}'] + row[1:])
+
+    start = time.perf_counter()
+    dataclean.run_pipeline(source, [dataclean.DynamoJSONWriter(os.path.join(directory, 'yelp_data.json')),
+                                    dataclean.BulkWriter(os.path.join(directory, 'data.json')),
+                                    dataclean.SnapshotWriter(os.path.join(directory, 'yelp_data.snap'))])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--copies', type=int, default=10, help='times the scraped CSV is repeated')
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters per format; the fastest run is reported')
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        seconds = write_files(directory, args.copies)
+        print(f"dataclean wrote all three files in {seconds:.2f}s")
+        for label, name in FORMATS:
+            path = os.path.join(directory, name)
+            runs = []
+            for _ in range(args.runs):
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', path],
+                                        check=True, capture_output=True, text=True).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            best = min(runs, key=lambda run: run['load_ms'])
+            print(f"{label:<12} {os.path.getsize(path) / 1e6:7.2f} MB  rows={best['rows']:<7} "
+                  f"LF2 import={best['load_ms']:8.1f}ms  first lookups={best['lookup_ms']:6.2f}ms  "
+                  f"first zip request={best['near_ms']:7.1f}ms  rss +{best['rss_kb'] / 1024:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# Cold-start budget for the three Lambda handlers. Each handler is measured in a
+# fresh interpreter: module import time, first invocation against local
+# stand-ins, and the boto3 import plus client creation that the lazy clients
+# defer to the first call that needs them.
+#
+#   python benchmarks/bench_startup.py --max-import-ms 50
+
+import argparse
+import datetime
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+HANDLERS = ['LF0', 'LF1', 'LF2']
+HEAVY_MODULES = ['boto3', 'botocore', 'requests', 'dateutil', 'numpy']
+
+
+def lex_event():
+    tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    return {
+        'userId': 'bench',
+        'invocationSource': 'DialogCodeHook',
+        'sessionAttributes': {},
+        'currentIntent': {
+            'name': 'DiningSuggestionsIntent',
+            'slots': {
+                'Location': 'Manhattan',
+                'Cuisine': 'Chinese',
+                'NumberOfPeople': '2',
+                'DiningDate': tomorrow,
+                'DiningTime': '19:00',
+                'email': 'bench@example.com'
+            }
+        }
+    }
+
+
+def prepare(name):
+    # Installs stand-ins for everything the first invocation touches and returns its event
+    import clients
+    from stubs import LocalLex, LocalSQS, LocalSES, LocalTable, LocalDynamoDB, LocalSearchServer
+
+    dynamodb = LocalDynamoDB([LocalTable('previous-recs', 'email'), LocalTable('yelp-restaurants', 'business_id')])
+    clients.install('dynamodb', dynamodb, kind='resource')
+    clients.install('ses', LocalSES())
+    clients.install('lex-runtime', LocalLex())
+
+    if name == 'LF0':
+        return {'body': json.dumps({'messages': [{'type': 'unstructured', 'unstructured': {'text': 'hello'}}]})}
+    if name == 'LF1':
+        return lex_event()
+
+    import LF2
+    import envelope
+    sqs = LocalSQS()
+    clients.install('sqs', sqs)
+    LF2.ES_URL = LocalSearchServer([]).start().url
+    slots = lex_event()['currentIntent']['slots']
+    request = {
+        'location': slots['Location'],
+        'cuisine': slots['Cuisine'],
+        'number_of_people': slots['NumberOfPeople'],
+        'dining_date': slots['DiningDate'],
+        'dining_time': slots['DiningTime'],
+        'email': slots['email']
+    }
+    sqs.send_message(QueueUrl=LF2.queue_url, MessageBody=envelope.encode([request]))
+    return {}
+
+
+def client_names(name):
+    return {'LF0': ['lex-runtime'], 'LF1': ['sqs', 'ses'], 'LF2': ['sqs', 'ses']}[name]
+
+
+def measure(name):
+    sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+    sys.path.insert(0, BENCHMARKS)
+
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    import_ms = (time.perf_counter() - start) * 1000
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    event = prepare(name)
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        start = time.perf_counter()
+        module.lambda_handler(event, None)
+        first_ms = (time.perf_counter() - start) * 1000
+    finally:
+        sys.stdout = stdout
+
+    # What the stand-ins skipped: importing boto3 and building the real clients
+    clients_ms = None
+    try:
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        start = time.perf_counter()
+        import boto3
+        for service in client_names(name):
+            boto3.client(service)
+        clients_ms = (time.perf_counter() - start) * 1000
+    except ImportError:
+        pass
+
+    print(json.dumps({'handler': name, 'import_ms': import_ms, 'first_invocation_ms': first_ms,
+                      'clients_ms': clients_ms, 'heavy_imports': loaded}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters per handler; the fastest run is reported')
+    parser.add_argument('--max-import-ms', type=float, help='exit non-zero if any handler imports slower than this')
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child)
+        return
+
+    failed = False
+    for name in HANDLERS:
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name],
+                                    check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        best = min(runs, key=lambda run: run['import_ms'])
+        clients_ms = '   n/a' if best['clients_ms'] is None else f"{best['clients_ms']:6.1f}"
+        print(f"{name}  import={best['import_ms']:7.1f}ms  first_invocation={best['first_invocation_ms']:7.1f}ms  "
+              f"boto3_clients={clients_ms}ms  heavy_imports={','.join(best['heavy_imports']) or '-'}")
+        if args.max_import_ms is not None and best['import_ms'] > args.max_import_ms:
+            failed = True
+
+    if failed:
+        print(f"import time over budget of {args.max_import_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Cost of finding a message's suggestions in LF2: the search path (OpenSearch
+# query plus batch_get_item on yelp-restaurants) against one read of the list
+# precomputed by yelp/build_top_lists.py, cold and from the warm-invocation cache.
+# Also shows how the weighted pick spreads over each list.
+#
+#   python benchmarks/bench_top_lists.py --requests 300 --latency 0.005
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Lambda'))
+sys.path.insert(0, os.path.join(ROOT, 'yelp'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import build_top_lists
+import clients
+import LF2
+from stubs import LocalDynamoDB, LocalSearchServer, LocalTable, load_yelp_items
+
+CUISINES = ['Chinese', 'Indian', 'Italian']
+
+
+def run(label, requests, location, dynamodb, server, clear_cache):
+    dynamodb.calls.clear()
+    for table in dynamodb.tables.values():
+        table.calls.clear()
+    server.reset_stats()
+    LF2.top_list_cache.clear()
+    LF2.restaurant_cache.clear()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(requests):
+            if clear_cache:
+                LF2.top_list_cache.clear()
+                LF2.restaurant_cache.clear()
+            LF2.find_restaurants(CUISINES[i % len(CUISINES)], location=location)
+    elapsed = time.perf_counter() - start
+
+    reads = sum(dynamodb.calls.values()) + sum(sum(table.calls.values()) for table in dynamodb.tables.values())
+    print(f"{label:<22} {elapsed / requests * 1000:7.2f} ms/request  "
+          f"searches/request={server.requests / requests:.2f}  dynamodb calls/request={reads / requests:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds per DynamoDB and OpenSearch call')
+    parser.add_argument('--picks', type=int, default=20000)
+    args = parser.parse_args()
+
+    items = load_yelp_items(os.path.join(ROOT, 'yelp', 'yelp_data.json'))
+    lists = build_top_lists.build_top_lists(os.path.join(ROOT, 'yelp', 'yelp_data.json'))
+    dynamodb = LocalDynamoDB([
+        LocalTable('yelp-restaurants', 'business_id', args.latency, items),
+        LocalTable(LF2.TOP_LISTS_TABLE, 'list_key', args.latency, {item['list_key']: item for item in lists})
+    ], args.latency)
+    clients.install('dynamodb', dynamodb, kind='resource')
+
+    server = LocalSearchServer(items.values(), args.latency).start()
+    LF2.ES_URL = server.url
+    try:
+        run('search + batch get', args.requests, None, dynamodb, server, clear_cache=True)
+        run('top list, cold', args.requests, 'Manhattan', dynamodb, server, clear_cache=True)
+        run('top list, warm', args.requests, 'Manhattan', dynamodb, server, clear_cache=False)
+    finally:
+        server.stop()
+
+    candidates = LF2.load_top_list('Manhattan', 'Chinese')
+    counts = Counter(restaurant['business_id'] for _ in range(args.picks)
+                     for restaurant in LF2.pick_weighted(candidates))
+    ranks = [counts[candidate[0]] / (args.picks * LF2.SUGGESTION_COUNT) for candidate in candidates]
+    print(f"pick share of the Chinese list: top 5 {sum(ranks[:5]):.0%}, top 20 {sum(ranks[:20]):.0%}, "
+          f"rank 1 {ranks[0]:.1%}, last {ranks[-1]:.2%}; uniform would give {1 / len(candidates):.1%} each")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# End to end against the local queue: a producer sends messages at --rate per
+# second while they are consumed either by LF2.lambda_handler invoked every
+# --interval seconds (a scheduled Lambda doing one short poll) or by the
+# long-polling worker. Reports the enqueue-to-delete latency, receive calls and
+# how many of them came back empty, and the time the worker took to drain and
+# stop. A last run makes some messages slower than the visibility timeout, with
+# and without visibility extension, and counts the redeliveries.
+#
+#   python benchmarks/bench_worker.py --messages 200 --rate 50
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_lf2_batch
+import envelope
+import LF2
+import worker
+
+CUISINES = ['Chinese', 'Indian', 'Italian']
+# The worker gets its queue from --queue-url, not from LF2's placeholder
+WORKER_QUEUE_URL = 'https://sqs.us-east-1.amazonaws.com/123456789012/worker-bench'
+
+
+def produce(sqs, messages, rate, queue_url=LF2.queue_url):
+    start = time.perf_counter()
+    for i in range(messages):
+        # Evenly spaced arrivals
+        time.sleep(max(0.0, start + i / rate - time.perf_counter()))
+        request = {'location': 'Manhattan', 'cuisine': CUISINES[i % len(CUISINES)], 'number_of_people': 2,
+                   'dining_date': '2026-11-01', 'dining_time': '19:00', 'email': 'user%d@example.com' % i}
+        sqs.send_message(QueueUrl=queue_url, MessageBody=envelope.encode([request]))
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+def report(label, sqs, ses, messages, extra=''):
+    latencies = sorted((sqs.deleted_at[message_id] - sent) * 1000
+                       for message_id, sent in sqs.sent_at.items() if message_id in sqs.deleted_at)
+    redelivered = sum(count - 1 for count in sqs.receive_counts.values())
+    print(f"{label:<22} deleted={len(latencies):<4}/{messages:<4} p50={percentile(latencies, 50):8.1f}ms "
+          f"p95={percentile(latencies, 95):8.1f}ms  receives={sqs.calls['receive_message']:<4} "
+          f"empty={sqs.empty_receives:<4} redelivered={redelivered:<3} emails={len(ses.sent):<4}{extra}")
+
+
+def scheduled(args):
+    sqs, ses, _ = bench_lf2_batch.install_stubs(args.latency)
+    producer = threading.Thread(target=produce, args=(sqs, args.messages, args.rate))
+    producer.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while producer.is_alive() or sqs.queue:
+            LF2.lambda_handler({}, None)
+            time.sleep(args.interval)
+    producer.join()
+    report(f'scheduled every {args.interval:g}s', sqs, ses, args.messages)
+
+
+def long_polling(args, visibility_timeout=30, slow=None, extend=True, label=None):
+    sqs, ses, _ = bench_lf2_batch.install_stubs(args.latency, WORKER_QUEUE_URL)
+    consumer = worker.Worker(args.pollers, args.wait_time, visibility_timeout, WORKER_QUEUE_URL)
+    if not extend:
+        consumer.keeper.extend = lambda margin: None
+    save_user_search = LF2.save_user_search
+    if slow:
+        # The first delivery of every tenth request takes longer than the visibility timeout
+        slowed = set()
+
+        def slow_save(email, request, restaurants):
+            if int(email[len('user'):email.index('@')]) % 10 == 0 and email not in slowed:
+                slowed.add(email)
+                time.sleep(slow)
+            return save_user_search(email, request, restaurants)
+        LF2.save_user_search = slow_save
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            consumer.start()
+            produce(sqs, args.messages, args.rate, WORKER_QUEUE_URL)
+            while sqs.queue or sqs.in_flight:
+                time.sleep(0.01)
+            start = time.perf_counter()
+            consumer.stop()
+            consumer.join()
+            stopped = time.perf_counter() - start
+    finally:
+        LF2.save_user_search = save_user_search
+    report(label or f'worker x{args.pollers}', sqs, ses, args.messages,
+           f"  stop={stopped:5.2f}s  extensions={consumer.keeper.extended}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=50, help='messages sent per second')
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds added to every external call')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between scheduled invocations')
+    parser.add_argument('--pollers', type=int, default=worker.POLLERS)
+    parser.add_argument('--wait-time', type=float, default=2, help='long-poll seconds')
+    args = parser.parse_args()
+
+    scheduled(args)
+    long_polling(args)
+    long_polling(args, visibility_timeout=1, slow=1.5, extend=False, label='slow, no extension')
+    long_polling(args, visibility_timeout=1, slow=1.5, label='slow, extended')
+
+
+if __name__ == '__main__':
+    main()
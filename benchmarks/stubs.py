@@ -0,0 +1,640 @@
+# Local stand-ins for the AWS services used by the Lambda functions.
+# They only implement the calls this repo makes, with an optional delay per call
+# so the benchmarks can model network round-trips.
+
+import itertools
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+
+class LocalService:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class QueueDoesNotExist(Exception):
+    # Shaped like the botocore ClientError SQS raises for an unknown queue
+    response = {'Error': {'Code': 'AWS.SimpleQueueService.NonExistentQueue'}}
+
+
+class LocalSQS(LocalService):
+    """In-memory queue with receipt handles and in-flight tracking.
+
+    receive_message long-polls when given WaitTimeSeconds. A message received
+    with a VisibilityTimeout goes back on the queue once it expires, unless it
+    was deleted or its visibility was extended first; without one it stays in
+    flight until requeue_in_flight. The send and delete time of every message is
+    kept for end-to-end latencies. Calls for any other queue URL than queue_url
+    (the placeholder LF1 and LF2 ship with, by default) fail like SQS would.
+    """
+
+    def __init__(self, latency=0.0, queue_url='SQS Queue URL'):
+        super().__init__(latency)
+        self.queue_url = queue_url
+        self.queue = deque()
+        self.in_flight = {}
+        self.deleted = 0
+        self.empty_receives = 0
+        self.receive_counts = Counter()
+        self.sent_at = {}
+        self.deleted_at = {}
+        self._visible_at = {}
+        self._ids = itertools.count()
+        self._arrived = threading.Condition(self._lock)
+
+    def send_message(self, QueueUrl, MessageBody, MessageAttributes=None, **kwargs):
+        self._call('send_message')
+        self._check(QueueUrl)
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self.queue.append({
+                'MessageId': message_id,
+                'Body': MessageBody,
+                'MessageAttributes': MessageAttributes or {}
+            })
+            self.sent_at[message_id] = time.perf_counter()
+            self._arrived.notify()
+        return {'MessageId': message_id}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=None, **kwargs):
+        self._call('receive_message')
+        self._check(QueueUrl)
+        deadline = time.perf_counter() + WaitTimeSeconds
+        messages = []
+        with self._lock:
+            while True:
+                self._expire()
+                while self.queue and len(messages) < min(MaxNumberOfMessages, 10):
+                    message = dict(self.queue.popleft())
+                    message['ReceiptHandle'] = 'rh-%d' % next(self._ids)
+                    self.in_flight[message['ReceiptHandle']] = message
+                    if VisibilityTimeout is not None:
+                        self._visible_at[message['ReceiptHandle']] = time.perf_counter() + VisibilityTimeout
+                    self.receive_counts[message['MessageId']] += 1
+                    messages.append(message)
+                remaining = deadline - time.perf_counter()
+                if messages or remaining <= 0:
+                    break
+                # Woken by a send; the short timeout also notices expired messages
+                self._arrived.wait(min(remaining, 0.05))
+            if not messages:
+                self.empty_receives += 1
+        return {'Messages': messages} if messages else {}
+
+    def _check(self, queue_url):
+        if queue_url != self.queue_url:
+            raise QueueDoesNotExist(f"The specified queue does not exist: {queue_url}")
+
+    def _expire(self):
+        now = time.perf_counter()
+        for handle in [handle for handle, visible_at in self._visible_at.items() if visible_at <= now]:
+            del self._visible_at[handle]
+            message = self.in_flight.pop(handle, None)
+            if message is not None:
+                message = dict(message)
+                message.pop('ReceiptHandle')
+                self.queue.append(message)
+
+    def change_message_visibility_batch(self, QueueUrl, Entries):
+        self._call('change_message_visibility_batch')
+        self._check(QueueUrl)
+        successful, failed = [], []
+        with self._lock:
+            for entry in Entries:
+                if entry['ReceiptHandle'] in self.in_flight:
+                    self._visible_at[entry['ReceiptHandle']] = time.perf_counter() + entry['VisibilityTimeout']
+                    successful.append({'Id': entry['Id']})
+                else:
+                    failed.append({'Id': entry['Id'], 'SenderFault': True, 'Code': 'ReceiptHandleIsInvalid', 'Message': 'Unknown receipt handle'})
+        return {'Successful': successful, 'Failed': failed}
+
+    def _delete(self, handle):
+        message = self.in_flight.pop(handle, None)
+        self._visible_at.pop(handle, None)
+        if message is None:
+            return False
+        self.deleted += 1
+        self.deleted_at.setdefault(message['MessageId'], time.perf_counter())
+        return True
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        self._call('delete_message')
+        self._check(QueueUrl)
+        with self._lock:
+            self._delete(ReceiptHandle)
+        return {}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        self._call('delete_message_batch')
+        self._check(QueueUrl)
+        successful, failed = [], []
+        with self._lock:
+            for entry in Entries:
+                if self._delete(entry['ReceiptHandle']):
+                    successful.append({'Id': entry['Id']})
+                else:
+                    failed.append({'Id': entry['Id'], 'SenderFault': True, 'Code': 'ReceiptHandleIsInvalid', 'Message': 'Unknown receipt handle'})
+        return {'Successful': successful, 'Failed': failed}
+
+    def requeue_in_flight(self):
+        # Equivalent of the visibility timeout expiring
+        with self._lock:
+            for message in self.in_flight.values():
+                message = dict(message)
+                message.pop('ReceiptHandle')
+                self.queue.append(message)
+            self.in_flight.clear()
+            self._visible_at.clear()
+
+
+class LocalTable(LocalService):
+    def __init__(self, name, key, latency=0.0, items=None):
+        super().__init__(latency)
+        self.name = name
+        self.key = key
+        self.items = dict(items or {})
+
+    def get_item(self, Key, **kwargs):
+        self._call('get_item')
+        item = self.items.get(Key[self.key])
+        return {'Item': dict(item)} if item is not None else {}
+
+    def put_item(self, Item, **kwargs):
+        self._call('put_item')
+        with self._lock:
+            self.items[Item[self.key]] = dict(Item)
+        return {}
+
+
+class LocalDynamoDB(LocalService):
+    """Stands in for boto3.resource('dynamodb')."""
+
+    def __init__(self, tables, latency=0.0):
+        super().__init__(latency)
+        self.tables = {table.name: table for table in tables}
+
+    def Table(self, name):
+        return self.tables[name]
+
+    def batch_get_item(self, RequestItems):
+        self._call('batch_get_item')
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.tables[name]
+            fields = None
+            if 'ProjectionExpression' in request:
+                names = request.get('ExpressionAttributeNames', {})
+                fields = [names.get(f.strip(), f.strip()) for f in request['ProjectionExpression'].split(',')]
+            items = []
+            for key in request['Keys']:
+                item = table.items.get(key[table.key])
+                if item is not None:
+                    items.append({k: v for k, v in item.items() if fields is None or k in fields})
+            responses[name] = items
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+class LocalDynamoDBClient(LocalService):
+    """Stands in for boto3.client('dynamodb') batch writes.
+
+    unprocessed_rate hands back that share of each batch as UnprocessedItems, the way
+    DynamoDB does under throttling; fail_after raises once that many calls were made,
+    to simulate a crash.
+    """
+
+    def __init__(self, latency=0.0, unprocessed_rate=0.0, fail_after=None, seed=0):
+        super().__init__(latency)
+        self.tables = {}
+        self.unprocessed_rate = unprocessed_rate
+        self.fail_after = fail_after
+        self.writes = 0
+        self._random = random.Random(seed)
+
+    def batch_write_item(self, RequestItems):
+        self._call('batch_write_item')
+        with self._lock:
+            if self.fail_after is not None and self.calls['batch_write_item'] > self.fail_after:
+                raise ConnectionError('Simulated crash')
+
+        unprocessed = {}
+        for name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise ValueError('Too many items in batch_write_item')
+            table = self.tables.setdefault(name, {})
+            for request in requests:
+                with self._lock:
+                    throttled = self._random.random() < self.unprocessed_rate
+                if throttled:
+                    unprocessed.setdefault(name, []).append(request)
+                    continue
+                if 'PutRequest' in request:
+                    item = request['PutRequest']['Item']
+                    key = item['business_id']['S']
+                    with self._lock:
+                        table[key] = item
+                        self.writes += 1
+                else:
+                    key = request['DeleteRequest']['Key']['business_id']['S']
+                    with self._lock:
+                        table.pop(key, None)
+                        self.writes += 1
+        return {'UnprocessedItems': unprocessed}
+
+
+class StubClientError(Exception):
+    """Carries a botocore-style error response, which is all the Lambda code inspects."""
+
+    def __init__(self, code, message=''):
+        super().__init__('An error occurred (%s): %s' % (code, message))
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class LocalSES(LocalService):
+    """Stands in for boto3.client('ses'): single sends, stored templates and bulk sends.
+
+    Bulk sends are rendered from the stored template, so `sent` holds the same
+    (Destination, Message) pairs either way. `bytes_sent` counts the request
+    payloads; more than `max_send_rate` recipients in one second are throttled.
+    """
+
+    def __init__(self, latency=0.0, max_send_rate=None):
+        super().__init__(latency)
+        self.sent = []
+        self.templates = {}
+        self.max_send_rate = max_send_rate
+        self.bytes_sent = 0
+        self.throttled = 0
+        self._window = deque()
+
+    def _admit(self, recipients, payload):
+        with self._lock:
+            self.bytes_sent += len(json.dumps(payload).encode())
+            if self.max_send_rate:
+                now = time.monotonic()
+                while self._window and self._window[0] <= now - 1:
+                    self._window.popleft()
+                if len(self._window) + recipients > self.max_send_rate:
+                    self.throttled += 1
+                    raise StubClientError('Throttling', 'Maximum sending rate exceeded.')
+                self._window.extend([now] * recipients)
+
+    def send_email(self, Source, Destination, Message, **kwargs):
+        self._call('send_email')
+        self._admit(1, {'Source': Source, 'Destination': Destination, 'Message': Message})
+        with self._lock:
+            self.sent.append((Destination, Message))
+        return {'MessageId': str(uuid.uuid4())}
+
+    def get_template(self, TemplateName):
+        self._call('get_template')
+        if TemplateName not in self.templates:
+            raise StubClientError('TemplateDoesNotExist', 'Template %s does not exist.' % TemplateName)
+        return {'Template': dict(self.templates[TemplateName])}
+
+    def create_template(self, Template):
+        self._call('create_template')
+        self.templates[Template['TemplateName']] = dict(Template)
+        return {}
+
+    def update_template(self, Template):
+        self._call('update_template')
+        self.templates[Template['TemplateName']] = dict(Template)
+        return {}
+
+    def send_bulk_templated_email(self, Source, Template, DefaultTemplateData, Destinations, **kwargs):
+        self._call('send_bulk_templated_email')
+        if len(Destinations) > 50:
+            raise StubClientError('InvalidParameterValue', 'Too many destinations.')
+        if Template not in self.templates:
+            raise StubClientError('TemplateDoesNotExist', 'Template %s does not exist.' % Template)
+        self._admit(len(Destinations), {'Source': Source, 'Template': Template,
+                                        'DefaultTemplateData': DefaultTemplateData, 'Destinations': Destinations})
+        template = self.templates[Template]
+        statuses = []
+        for destination in Destinations:
+            data = dict(json.loads(DefaultTemplateData), **json.loads(destination.get('ReplacementTemplateData', '{}')))
+            message = {
+                'Subject': {'Data': render_template(template['SubjectPart'], data)},
+                'Body': {'Text': {'Data': render_template(template.get('TextPart', ''), data)},
+                         'Html': {'Data': render_template(template.get('HtmlPart', ''), data)}}
+            }
+            with self._lock:
+                self.sent.append((destination['Destination'], message))
+            statuses.append({'Status': 'Success', 'MessageId': str(uuid.uuid4())})
+        return {'Status': statuses}
+
+
+def render_template(template, data):
+    # The Handlebars subset the email template uses: {{{field}}}, {{field}} and
+    # {{#each list}}...{{/each}} without nesting
+    import html
+    import re
+
+    def each(match):
+        return ''.join(render_template(match.group(2), item) for item in data.get(match.group(1), []))
+
+    template = re.sub(r'\{\{#each (\w+)\}\}(.*?)\{\{/each\}\}', each, template, flags=re.S)
+    template = re.sub(r'\{\{\{(\w+)\}\}\}', lambda match: str(data.get(match.group(1), '')), template)
+    return re.sub(r'\{\{(\w+)\}\}', lambda match: html.escape(str(data.get(match.group(1), ''))), template)
+
+
+class LocalLex(LocalService):
+    """Answers post_text with a canned reply."""
+
+    def __init__(self, latency=0.0, reply='Hi there, how can I help?'):
+        super().__init__(latency)
+        self.reply = reply
+
+    def post_text(self, botName, botAlias, userId, inputText, **kwargs):
+        self._call('post_text')
+        return {'message': self.reply, 'dialogState': 'Fulfilled'}
+
+
+class LocalHTTPServer:
+    """Threaded HTTP/1.1 server on localhost that answers with JSON.
+
+    Subclasses implement handle(method, path, params, body) -> (status, payload).
+    Counts requests, TCP connections and response bytes.
+    """
+
+    path = '/'
+
+    def __init__(self, latency=0.0):
+        from http.server import ThreadingHTTPServer
+
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return 'http://%s:%d' % (host, port)
+
+    @property
+    def url(self):
+        return self.base_url + self.path
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = self.connections = self.bytes_sent = 0
+
+    def handle(self, method, path, params, body):
+        raise NotImplementedError
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+        from urllib.parse import urlsplit, parse_qsl
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out as separate writes; without this Nagle's
+                # algorithm stalls every keep-alive response on the delayed ACK
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                url = urlsplit(self.path)
+                if server.latency:
+                    time.sleep(server.latency)
+                status, payload = server.handle(self.command, url.path, dict(parse_qsl(url.query)), body)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(data)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = _respond
+
+        return Handler
+
+
+class LocalSearchServer(LocalHTTPServer):
+    """Minimal OpenSearch _search endpoint.
+
+    Supports match queries on cuisine, function_score with a seeded random_score,
+    _source filtering and size.
+    """
+
+    path = '/restaurants/_search'
+
+    def __init__(self, documents, latency=0.0):
+        super().__init__(latency)
+        self.documents = list(documents)
+
+    def handle(self, method, path, params, body):
+        return 200, self.search(json.loads(body or b'{}'))
+
+    def search(self, query):
+        size = query.get('size', 10)
+        seed = None
+        if 'function_score' in query.get('query', {}):
+            function_score = query['query']['function_score']
+            seed = function_score.get('random_score', {}).get('seed')
+            query = dict(query, query=function_score['query'])
+
+        cuisine = query.get('query', {}).get('match', {}).get('cuisine')
+        hits = [doc for doc in self.documents if cuisine is None or doc['cuisine'].lower() == str(cuisine).lower()]
+        if seed is not None:
+            hits = list(hits)
+            random.Random(seed).shuffle(hits)
+
+        fields = query.get('_source')
+        if isinstance(fields, list):
+            hits = [{k: v for k, v in doc.items() if k in fields} for doc in hits]
+
+        return {
+            'hits': {
+                'total': {'value': len(hits), 'relation': 'eq'},
+                'hits': [{'_index': 'restaurants', '_source': doc} for doc in hits[:size]]
+            }
+        }
+
+
+class LocalBulkServer(LocalHTTPServer):
+    """Minimal OpenSearch _bulk endpoint that stores documents by index and _id.
+
+    More than `max_inflight` concurrent requests get a 429 for the whole request,
+    and each item is rejected with a per-item 429 with probability `reject_rate`,
+    like a node whose write queue is full. With `strict`, documents carrying
+    fields outside it fail with a 400 mapping error. Each request also takes
+    `doc_latency` per item.
+    """
+
+    path = '/_bulk'
+
+    def __init__(self, latency=0.0, doc_latency=0.0, max_inflight=None, reject_rate=0.0, strict=None, seed=0):
+        super().__init__(latency)
+        self.doc_latency = doc_latency
+        self.max_inflight = max_inflight
+        self.reject_rate = reject_rate
+        self.strict = set(strict) if strict else None
+        self.indices = {}
+        self.throttled = 0
+        self.rejected = 0
+        self.bytes_received = 0
+        self._inflight = 0
+        self._random = random.Random(seed)
+
+    def reset_stats(self):
+        super().reset_stats()
+        with self._lock:
+            self.throttled = self.rejected = self.bytes_received = 0
+
+    def handle(self, method, path, params, body):
+        if path != self.path:
+            return 404, {'error': 'no handler found for uri [%s]' % path}
+        with self._lock:
+            self.bytes_received += len(body)
+            if self.max_inflight and self._inflight >= self.max_inflight:
+                self.throttled += 1
+                return 429, {'error': {'type': 'es_rejected_execution_exception'}, 'status': 429}
+            self._inflight += 1
+        try:
+            result = self.bulk(body)
+            if self.doc_latency:
+                time.sleep(self.doc_latency * len(result['items']))
+            return 200, result
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def bulk(self, body):
+        lines = iter(body.decode('utf-8').splitlines())
+        items, errors = [], False
+        for line in lines:
+            if not line.strip():
+                continue
+            (op, meta), = json.loads(line).items()
+            source = None if op == 'delete' else json.loads(next(lines))
+            index = self.indices.setdefault(meta.get('_index', 'restaurants'), {})
+            doc_id = meta.get('_id') or uuid.uuid4().hex
+            with self._lock:
+                reject = self.reject_rate and self._random.random() < self.reject_rate
+            if reject:
+                with self._lock:
+                    self.rejected += 1
+                outcome = {'status': 429, 'error': {'type': 'es_rejected_execution_exception'}}
+            elif self.strict and source is not None and set(source) - self.strict:
+                outcome = {'status': 400, 'error': {'type': 'strict_dynamic_mapping_exception'}}
+            elif op == 'delete':
+                outcome = {'status': 200 if index.pop(doc_id, None) is not None else 404, 'result': 'deleted'}
+            else:
+                created = doc_id not in index
+                index[doc_id] = source
+                outcome = {'status': 201 if created else 200, 'result': 'created' if created else 'updated'}
+            outcome.update(_index=meta.get('_index', 'restaurants'), _id=doc_id)
+            errors = errors or outcome['status'] >= 300 and not (op == 'delete' and outcome['status'] == 404)
+            items.append({op: outcome})
+        return {'took': 1, 'errors': errors, 'items': items}
+
+
+class LocalYelpServer(LocalHTTPServer):
+    """Mock of the Yelp Fusion /v3/businesses/search endpoint.
+
+    Every term has `per_term` synthetic businesses; consecutive pages overlap by a
+    few results like the real API does. More than `max_qps` requests in one second
+    get a 429.
+    """
+
+    path = '/v3/businesses/search'
+
+    def __init__(self, per_term=1000, latency=0.0, max_qps=None, overlap=3):
+        super().__init__(latency)
+        self.per_term = per_term
+        self.max_qps = max_qps
+        self.overlap = overlap
+        self.throttled = 0
+        self._window = deque()
+
+    def handle(self, method, path, params, body):
+        if path != self.path:
+            return 404, {'error': {'code': 'NOT_FOUND'}}
+        if self.max_qps:
+            now = time.monotonic()
+            with self._lock:
+                while self._window and self._window[0] <= now - 1:
+                    self._window.popleft()
+                if len(self._window) >= self.max_qps:
+                    self.throttled += 1
+                    return 429, {'error': {'code': 'TOO_MANY_REQUESTS_PER_SECOND'}}
+                self._window.append(now)
+
+        term = params.get('term', '').replace('+', ' ')
+        limit = int(params.get('limit', 20))
+        offset = int(params.get('offset', 0))
+        start = max(0, offset - self.overlap if offset else 0)
+        businesses = [self.business(term, i) for i in range(start, min(self.per_term, offset + limit))]
+        return 200, {'businesses': businesses, 'total': self.per_term}
+
+    def business(self, term, i):
+        rng = random.Random('%s-%d' % (term, i))
+        return {
+            'id': '%s-%05d' % (term.split()[0].lower(), i),
+            'name': '%s place %d' % (term, i),
+            'review_count': rng.randint(1, 5000),
+            'rating': rng.choice([3.5, 4.0, 4.2, 4.5, 4.8]),
+            'coordinates': {'latitude': rng.uniform(40.70, 40.88), 'longitude': rng.uniform(-74.02, -73.91)},
+            'location': {'display_address': ['%d Broadway' % i, 'New York, NY 10001'], 'zip_code': '10001'}
+        }
+
+
+def load_yelp_items(path):
+    # Flattens the DynamoDB typed JSON export into plain items
+    import json
+    from decimal import Decimal
+
+    with open(path) as file:
+        records = json.load(file)
+
+    items = {}
+    for record in records:
+        item = {}
+        for key, value in record.items():
+            if 'N' in value:
+                item[key] = Decimal(value['N'])
+            else:
+                item[key] = value['S']
+        items[item['business_id']] = item
+    return items
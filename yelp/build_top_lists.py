@@ -0,0 +1,99 @@
+import argparse
+import datetime
+import json
+import math
+from collections import defaultdict
+
+import boto3
+
+from push_to_dynamo import iter_json_array
+
+# LF2 reads one of these items per request instead of searching OpenSearch and
+# then fetching each suggestion from yelp-restaurants
+TOP_LISTS_TABLE = 'restaurant-top-lists'
+# The scrape only covers Manhattan, which is also the only location LF1 accepts
+LOCATION = 'Manhattan'
+TOP_N = 50
+# Rating points between two candidates that make the better one e times as likely
+# to be picked
+TEMPERATURE = 0.25
+
+
+def list_key(location, cuisine):
+    # Must match LF2.top_list_key
+    cuisine = str(cuisine).strip()
+    if cuisine.lower().endswith(' restaurant'):
+        cuisine = cuisine[:-len(' restaurant')]
+    return '{}#{}'.format(str(location).strip().lower(), cuisine.lower())
+
+
+def score(rating, reviews, prior_rating, prior_reviews):
+    # Bayesian average: a 5.0 with three reviews should not outrank a 4.6 with
+    # three thousand, so every rating is pulled towards the cuisine's mean by the
+    # weight of a typical number of reviews
+    return (rating * reviews + prior_rating * prior_reviews) / (reviews + prior_reviews)
+
+
+def rank(records, top_n=TOP_N, temperature=TEMPERATURE):
+    # records are (business_id, name, rating, number_of_reviews, address) of one
+    # cuisine; returns the best top_n with their pick weights appended
+    if not records:
+        return []
+    prior_rating = sum(record[2] for record in records) / len(records)
+    reviews = sorted(record[3] for record in records)
+    prior_reviews = max(1, reviews[len(reviews) // 2])
+
+    scored = sorted(((score(record[2], record[3], prior_rating, prior_reviews), record) for record in records),
+                    key=lambda pair: pair[0], reverse=True)[:top_n]
+    best = scored[0][0]
+    # Weights stay positive so LF2's weighted sampling can still reach every candidate
+    return [list(record) + [max(0.0001, round(math.exp((value - best) / temperature), 4))] for value, record in scored]
+
+
+def build_top_lists(filename, location=LOCATION, top_n=TOP_N):
+    by_cuisine = defaultdict(dict)
+    with open(filename, encoding='utf-8') as file:
+        for item in iter_json_array(file):
+            record = (item['business_id']['S'], item['name']['S'], float(item['rating']['N']),
+                      int(float(item['number_of_reviews']['N'])), item['address']['S'])
+            by_cuisine[list_key(location, item['cuisine']['S'])][record[0]] = record
+
+    built_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+    lists = []
+    for key, records in sorted(by_cuisine.items()):
+        candidates = rank(list(records.values()), top_n)
+        lists.append({
+            'list_key': key,
+            'built_at': built_at,
+            'size': len(candidates),
+            # One string attribute instead of a list of maps keeps the item small
+            # and spares LF2 the Decimal conversions
+            'candidates': json.dumps(candidates, separators=(',', ':'), ensure_ascii=False)
+        })
+    return lists
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the ranked suggestion list of every cuisine')
+    parser.add_argument('filename', help='DynamoDB typed JSON export, e.g. yelp_data.json')
+    parser.add_argument('--location', default=LOCATION)
+    parser.add_argument('--top', type=int, default=TOP_N)
+    parser.add_argument('--table', default=TOP_LISTS_TABLE)
+    parser.add_argument('--region')
+    parser.add_argument('--output', help='write the items to this JSON file instead of DynamoDB')
+    args = parser.parse_args()
+
+    lists = build_top_lists(args.filename, args.location, args.top)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(lists, file, indent=4, ensure_ascii=False)
+    else:
+        table = boto3.resource('dynamodb', region_name=args.region).Table(args.table)
+        for item in lists:
+            table.put_item(Item=item)
+    for item in lists:
+        print("{}: {} candidates, {} bytes".format(item['list_key'], item['size'], len(item['candidates'].encode('utf-8'))))
+
+
+if __name__ == '__main__':
+    main()
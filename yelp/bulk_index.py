@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# OpenSearch domain endpoint, without a path
+ES_HOST = os.environ.get('ES_HOST', 'Open Search URL')
+ES_AUTH = (os.environ.get('ES_USER', 'Username'), os.environ.get('ES_PASSWORD', 'Password'))
+
+# A few MB per _bulk request keeps the coordinating node busy without tripping
+# the request size limit
+MAX_CHUNK_BYTES = 5 * 1024 * 1024
+MAX_CHUNK_DOCS = 1000
+MAX_ATTEMPTS = 8
+# Per-item statuses worth sending again: the node's write queue was full
+RETRY_STATUSES = (429, 503)
+
+
+class BulkError(Exception):
+    pass
+
+
+def iter_actions(file):
+    # Yields (action line, source line or None) pairs from _bulk NDJSON. Delete
+    # actions are the only ones without a source line.
+    lines = (line for line in file if line.strip())
+    for line in lines:
+        action = json.loads(line)
+        if not isinstance(action, dict) or len(action) != 1:
+            raise BulkError(f'Expected an action line, got {line[:80]!r}')
+        if 'delete' in action:
+            yield line, None
+            continue
+        source = next(lines, None)
+        if source is None:
+            raise BulkError('Action line without a document at the end of the file')
+        yield line, source
+
+
+def iter_chunks(actions, max_bytes=MAX_CHUNK_BYTES, max_docs=MAX_CHUNK_DOCS):
+    # Groups the pairs into chunks bounded by document count and payload size
+    chunk, size = [], 0
+    for pair in actions:
+        pair_size = sum(len(line.encode('utf-8')) for line in pair if line is not None)
+        if chunk and (len(chunk) >= max_docs or size + pair_size > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(pair)
+        size += pair_size
+    if chunk:
+        yield chunk
+
+
+def to_payload(chunk):
+    parts = []
+    for action, source in chunk:
+        parts.append(action if action.endswith('\n') else action + '\n')
+        if source is not None:
+            parts.append(source if source.endswith('\n') else source + '\n')
+    return ''.join(parts).encode('utf-8')
+
+
+class AdaptiveDelay:
+    """Pause shared by every worker before each _bulk request.
+
+    It grows whenever the cluster pushes back, doubling on a 429 response and in
+    proportion to the share of items rejected otherwise, and halves after each
+    clean response. The whole indexer slows down together instead of every
+    thread retrying into a full write queue.
+    """
+
+    def __init__(self, initial=0.05, maximum=5.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.delay
+        if delay:
+            time.sleep(random.uniform(delay / 2, delay))
+
+    def throttled(self, share=1.0):
+        with self._lock:
+            self.delay = min(self.maximum, max(self.initial * share, self.delay * (1 + share)))
+
+    def succeeded(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.initial else 0.0
+
+
+def send_chunk(session, url, chunk, delay, auth=None, max_attempts=MAX_ATTEMPTS):
+    # Returns (indexed, failures, retries). Only the rejected items of a partial
+    # failure are sent again; mapping errors and the like are final. Raises
+    # BulkError when the whole request keeps being refused.
+    indexed, failures, retries = 0, [], 0
+    for attempt in range(max_attempts):
+        delay.wait()
+        response = session.post(url, data=to_payload(chunk), auth=auth, timeout=60,
+                                headers={'Content-Type': 'application/x-ndjson'})
+        if response.status_code in RETRY_STATUSES:
+            delay.throttled()
+            retries += 1
+            continue
+        if response.status_code != 200:
+            raise BulkError(f'_bulk returned {response.status_code}: {response.text[:200]}')
+
+        result = response.json()
+        if not result.get('errors'):
+            delay.succeeded()
+            return indexed + len(chunk), failures, retries
+
+        rejected, last_errors = [], []
+        for pair, item in zip(chunk, result['items']):
+            (op, outcome), = item.items()
+            status = outcome.get('status', 500)
+            if status < 300 or (op == 'delete' and status == 404):
+                indexed += 1
+            elif status in RETRY_STATUSES:
+                rejected.append(pair)
+                last_errors.append({'_id': outcome.get('_id'), 'status': status, 'error': outcome.get('error')})
+            else:
+                failures.append({'_id': outcome.get('_id'), 'status': status, 'error': outcome.get('error')})
+        if not rejected:
+            delay.succeeded()
+            return indexed, failures, retries
+        if attempt == max_attempts - 1:
+            # Out of attempts: the rejected documents count as failures
+            return indexed, failures + last_errors, retries
+        delay.throttled(len(rejected) / len(chunk))
+        retries += 1
+        chunk = rejected
+
+    raise BulkError(f'_bulk still throttled after {max_attempts} attempts')
+
+
+def make_session(workers):
+    # One keep-alive connection per worker thread
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def bulk_index(filename, host=ES_HOST, auth=ES_AUTH, workers=4, max_bytes=MAX_CHUNK_BYTES,
+               max_docs=MAX_CHUNK_DOCS, report_every=5.0):
+    with open(filename, encoding='utf-8') as file:
+        return index_actions(iter_actions(file), host, auth, workers, max_bytes, max_docs, report_every)
+
+
+def index_actions(actions, host=ES_HOST, auth=ES_AUTH, workers=4, max_bytes=MAX_CHUNK_BYTES,
+                  max_docs=MAX_CHUNK_DOCS, report_every=5.0):
+    # Sends (action line, source line or None) pairs and returns the run's stats
+    url = host.rstrip('/') + '/_bulk'
+    session = make_session(workers)
+    delay = AdaptiveDelay()
+    stats = {'indexed': 0, 'failed': 0, 'retries': 0, 'chunks': 0, 'failures': []}
+    start = time.perf_counter()
+    last_report = start
+    pending = set()
+
+    def collect(done):
+        for future in done:
+            # Re-raises the first chunk that could not be indexed at all
+            indexed, failures, retries = future.result()
+            stats['indexed'] += indexed
+            stats['failed'] += len(failures)
+            stats['retries'] += retries
+            stats['failures'].extend(failures[:max(0, 10 - len(stats['failures']))])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk in iter_chunks(actions, max_bytes, max_docs):
+            # Backpressure: reading stops while every worker has a chunk queued behind it
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(send_chunk, session, url, chunk, delay, auth))
+            stats['chunks'] += 1
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                print(f"{stats['indexed']} documents indexed, {stats['indexed'] / (now - start):.0f} docs/s")
+                last_report = now
+
+        done, pending = wait(pending)
+        collect(done)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['docs_per_second'] = stats['indexed'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"Indexed {stats['indexed']} documents in {stats['chunks']} chunks in {stats['seconds']:.2f}s "
+          f"({stats['docs_per_second']:.0f} docs/s), {stats['failed']} failed, {stats['retries']} retried requests")
+    for failure in stats['failures']:
+        print(f"  {failure['_id']}: {failure['status']} {failure['error']}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index the data.json bulk file into OpenSearch')
+    parser.add_argument('filename', help='_bulk NDJSON, e.g. data.json')
+    parser.add_argument('--host', default=ES_HOST, help='domain endpoint, e.g. https://search-....es.amazonaws.com')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-bytes', type=int, default=MAX_CHUNK_BYTES)
+    parser.add_argument('--max-docs', type=int, default=MAX_CHUNK_DOCS)
+    args = parser.parse_args()
+
+    stats = bulk_index(args.filename, args.host, ES_AUTH, args.workers, args.max_bytes, args.max_docs)
+    if stats['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,229 @@
-import pandas as pd
+import argparse
+import ast
+import csv
+import json
+import os
+import struct
+import sys
+import time
+from array import array
 
-# Load the CSV file to check its content
-file_path = 'Datapath on your local repo'
+# Streams the pipe-delimited scrape (yelp_data.csv) row by row and writes, in one
+# pass, the DynamoDB typed export (yelp_data.json), the OpenSearch bulk file
+# (data.json) and the binary catalog snapshot LF2 can memory-map (yelp_data.snap).
+# Apart from the snapshot's columns, the only state that grows with the input is
+# the set of seen ids.
 
-# Since the delimiter used was a pipe '|', we specify it when reading the CSV
-# We also assume that the first row contains incorrect headers
-df = pd.read_csv(file_path, delimiter='|', header=None)
+FIELD_NAMES = ['business_id', 'insertedAtTimestamp', 'name', 'address', 'coordinates', 'number_of_reviews', 'rating', 'zip_code', 'cuisine']
+INDEX_NAME = 'restaurants'
 
-# Correcting the headers manually
-correct_headers = ['business_id', 'insertedAtTimestamp', 'name', 'address', 'coordinates', 'number_of_reviews', 'rating', 'zip_code', 'cuisine']
+# Must match the snapshot layout in Lambda/catalog.py
+SNAPSHOT_MAGIC = b'YELPSNAP'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8s4I9Q')
+SNAPSHOT_CUISINE = struct.Struct('<3I')
+SNAPSHOT_FIELDS = ('business_id', 'name', 'address', 'zip_code', 'cuisine')
 
-# Assign the correct headers to the DataFrame
-df.columns = correct_headers
 
-# Remove duplicate entries based on 'business_id'
-df_unique = df.drop_duplicates(subset=['business_id'])
+def normalize_address(address):
+    # The scraper wrote Yelp's display_address list as its Python repr
+    address = address.strip()
+    if address.startswith('['):
+        try:
+            return ', '.join(str(part).strip() for part in ast.literal_eval(address))
+        except (ValueError, SyntaxError):
+            address = address.strip('[]').replace("'", '').replace('"', '')
+    return address
 
-# Save the DataFrame with unique entries back to a new CSV file
-unique_file_path = '/path/to/your/new/yelp_data_unique.csv'
-df_unique.to_csv(unique_file_path, index=False, sep='|')
 
-# Inform the user of completion
-print(f"Duplicates removed. The file with unique entries has been saved to {unique_file_path}")
\ No newline at end of file
+def normalize_cuisine(cuisine):
+    # Search terms were "<Cuisine> restaurant"; the stores keep just the cuisine
+    cuisine = cuisine.strip()
+    if cuisine.lower().endswith(' restaurant'):
+        cuisine = cuisine[:-len(' restaurant')]
+    return cuisine.title()
+
+
+def clean_row(row):
+    # Returns the normalized record, or None for repeated headers and malformed rows
+    if len(row) != len(FIELD_NAMES) or row[0] == 'business_id':
+        return None
+    record = dict(zip(FIELD_NAMES, (value.strip() for value in row)))
+    try:
+        record['number_of_reviews'] = int(float(record['number_of_reviews']))
+        record['rating'] = float(record['rating'])
+        latitude, longitude = (float(part) for part in record['coordinates'].split(','))
+    except ValueError:
+        return None
+    if not record['business_id']:
+        return None
+
+    record['coordinates'] = '{},{}'.format(latitude, longitude)
+    record['address'] = normalize_address(record['address'])
+    record['cuisine'] = normalize_cuisine(record['cuisine'])
+    return record
+
+
+def iter_clean_records(file, stats):
+    seen = set()
+    for row in csv.reader(file, delimiter='|'):
+        stats['rows'] += 1
+        record = clean_row(row)
+        if record is None:
+            stats['rejected'] += 1
+        elif record['business_id'] in seen:
+            stats['duplicates'] += 1
+        else:
+            seen.add(record['business_id'])
+            stats['records'] += 1
+            yield record
+
+
+class DynamoJSONWriter:
+    """Writes records as the typed JSON array push_to_dynamo.py loads, one element at a time."""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write('[')
+        self.count = 0
+
+    def write(self, record):
+        # Same layout as json.dump(..., indent=4) of the whole array, which would
+        # need the slow pure-Python encoder
+        attributes = []
+        for name in FIELD_NAMES:
+            if name in ('number_of_reviews', 'rating'):
+                kind, value = 'N', str(record[name])
+            else:
+                kind, value = 'S', record[name]
+            attributes.append('        "%s": {\n            "%s": %s\n        }' % (name, kind, json.dumps(value)))
+        element = '{\n' + ',\n'.join(attributes) + '\n    }'
+        self.file.write((',\n    ' if self.count else '\n    ') + element)
+        self.count += 1
+
+    def close(self):
+        self.file.write('\n]' if self.count else ']')
+        self.file.close()
+
+
+class BulkWriter:
+    """Writes records as OpenSearch _bulk NDJSON, keyed by business_id so reindexing overwrites."""
+
+    def __init__(self, path, index=INDEX_NAME):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.index = index
+
+    def write(self, record):
+        document = {name: record[name] for name in FIELD_NAMES if name != 'insertedAtTimestamp'}
+        self.file.write(json.dumps({'index': {'_index': self.index, '_id': record['business_id']}}) + '\n')
+        self.file.write(json.dumps(document) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class SnapshotWriter:
+    """Writes the binary catalog snapshot that LF2 reads in place (catalog.SnapshotCatalog).
+
+    The cuisine and id tables need every row, so the columns are kept until close.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.strings = []
+        self.ratings = array('d')
+        self.review_counts = array('I')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+
+    def write(self, record):
+        latitude, longitude = (float(part) for part in record['coordinates'].split(','))
+        self.strings.extend(str(record[name]) for name in SNAPSHOT_FIELDS)
+        self.ratings.append(float(record['rating']))
+        self.review_counts.append(int(record['number_of_reviews']))
+        self.latitudes.append(latitude)
+        self.longitudes.append(longitude)
+
+    def close(self):
+        rows = len(self.ratings)
+        fields = len(SNAPSHOT_FIELDS)
+        ids = self.strings[0::fields]
+        cuisine_of = self.strings[fields - 1::fields]
+
+        by_cuisine = {}
+        for row, cuisine in enumerate(cuisine_of):
+            by_cuisine.setdefault(cuisine.lower(), []).append(row)
+        strings = self.strings + [cuisine_of[members[0]] for members in by_cuisine.values()]
+        table, partition_rows = [], array('I')
+        for i, members in enumerate(by_cuisine.values()):
+            table.append(SNAPSHOT_CUISINE.pack(rows * fields + i, len(partition_rows), len(members)))
+            partition_rows.extend(members)
+        by_id = array('I', sorted(range(rows), key=ids.__getitem__))
+
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = array('I', [0])
+        for string in encoded:
+            offsets.append(offsets[-1] + len(string))
+
+        sections = [self.ratings, self.review_counts, self.latitudes, self.longitudes, offsets,
+                    b''.join(table), partition_rows, by_id, b''.join(encoded)]
+        if sys.byteorder != 'little':
+            for section in sections:
+                if isinstance(section, array):
+                    section.byteswap()
+        blobs = [bytes(section) for section in sections]
+        positions, position = [], SNAPSHOT_HEADER.size
+        for blob in blobs:
+            position += -position % 8
+            positions.append(position)
+            position += len(blob)
+
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, rows, len(strings), len(by_cuisine),
+                                            *positions))
+            for blob, position in zip(blobs, positions):
+                file.write(b'\0' * (position - file.tell()))
+                file.write(blob)
+        os.replace(temporary, self.path)
+
+
+def run_pipeline(source, writers):
+    stats = {'rows': 0, 'records': 0, 'duplicates': 0, 'rejected': 0}
+    start = time.perf_counter()
+    try:
+        with open(source, newline='', encoding='utf-8') as file:
+            for record in iter_clean_records(file, stats):
+                for writer in writers:
+                    writer.write(record)
+    finally:
+        for writer in writers:
+            writer.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    stats['megabytes_per_second'] = os.path.getsize(source) / 1e6 / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Clean the scraped CSV into the DynamoDB export, the OpenSearch bulk '
+                                                 'file and the catalog snapshot')
+    parser.add_argument('source', nargs='?', default=os.path.join(here, 'yelp_data.csv'))
+    parser.add_argument('--dynamo-json', default=os.path.join(here, 'yelp_data.json'))
+    parser.add_argument('--bulk', default=os.path.join(here, 'data.json'))
+    parser.add_argument('--snapshot', default=os.path.join(here, 'yelp_data.snap'),
+                        help="binary catalog for LF2's embedded mode; empty to skip")
+    args = parser.parse_args()
+
+    writers = [DynamoJSONWriter(args.dynamo_json), BulkWriter(args.bulk)]
+    if args.snapshot:
+        writers.append(SnapshotWriter(args.snapshot))
+    stats = run_pipeline(args.source, writers)
+    print("{records} unique restaurants from {rows} rows ({duplicates} duplicates, {rejected} rejected) "
+          "in {seconds:.2f}s: {rows_per_second:.0f} rows/s, {megabytes_per_second:.1f} MB/s".format(**stats))
+
+
+if __name__ == '__main__':
+    main()
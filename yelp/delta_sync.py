@@ -0,0 +1,156 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+import bulk_index
+from push_to_dynamo import BATCH_SIZE, iter_json_array, table_name, to_put_request, write_batch
+
+# Re-scraping stamps every row with a new insertedAtTimestamp, so it is left out of
+# the content hash; otherwise every publish would look like a full rewrite.
+VOLATILE_ATTRIBUTES = ('insertedAtTimestamp',)
+INDEX_NAME = 'restaurants'
+MANIFEST_VERSION = 1
+
+
+def content_hash(item):
+    content = {name: value for name, value in item.items() if name not in VOLATILE_ATTRIBUTES}
+    encoded = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class Manifest:
+    """Content hash of every business as it was last published to both stores."""
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = {}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                saved = json.load(file)
+            if saved.get('version') == MANIFEST_VERSION:
+                self.hashes = saved['hashes']
+
+    def save(self, hashes):
+        self.hashes = hashes
+        if not self.path:
+            return
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'version': MANIFEST_VERSION, 'hashes': hashes}, file, separators=(',', ':'))
+        os.replace(temporary, self.path)
+
+
+def diff(hashes, items):
+    # Returns (changes, new hashes). Only inserted and updated items are kept in
+    # memory; unchanged ones are counted and dropped.
+    changes = {'inserts': [], 'updates': [], 'deletes': [], 'unchanged': 0}
+    new_hashes = {}
+    for item in items:
+        business_id = item['business_id']['S']
+        if business_id in new_hashes:
+            continue
+        digest = new_hashes[business_id] = content_hash(item)
+        previous = hashes.get(business_id)
+        if previous is None:
+            changes['inserts'].append(item)
+        elif previous != digest:
+            changes['updates'].append(item)
+        else:
+            changes['unchanged'] += 1
+    changes['deletes'] = [business_id for business_id in hashes if business_id not in new_hashes]
+    return changes, new_hashes
+
+
+def to_document(item):
+    # Same document dataclean.py writes to the bulk file
+    document = {}
+    for name, value in item.items():
+        if name in VOLATILE_ATTRIBUTES:
+            continue
+        if 'N' in value:
+            document[name] = int(value['N']) if name == 'number_of_reviews' else float(value['N'])
+        else:
+            document[name] = value['S']
+    return document
+
+
+def iter_bulk_actions(changes, index=INDEX_NAME):
+    for item in changes['inserts'] + changes['updates']:
+        action = {'index': {'_index': index, '_id': item['business_id']['S']}}
+        yield json.dumps(action), json.dumps(to_document(item))
+    for business_id in changes['deletes']:
+        yield json.dumps({'delete': {'_index': index, '_id': business_id}}), None
+
+
+def sync_dynamodb(client, table, changes, workers=4):
+    requests = [to_put_request(item) for item in changes['inserts'] + changes['updates']]
+    requests += [{'DeleteRequest': {'Key': {'business_id': {'S': business_id}}}} for business_id in changes['deletes']]
+    batches = [requests[i:i + BATCH_SIZE] for i in range(0, len(requests), BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() re-raises the first batch that could not be written
+        list(executor.map(lambda batch: write_batch(client, table, batch), batches))
+    return len(requests)
+
+
+def delta_sync(filename, manifest_path, client=None, table=table_name, host=bulk_index.ES_HOST,
+               auth=bulk_index.ES_AUTH, workers=4, dry_run=False):
+    start = time.perf_counter()
+    manifest = Manifest(manifest_path)
+    with open(filename, encoding='utf-8') as file:
+        changes, new_hashes = diff(manifest.hashes, iter_json_array(file))
+
+    changed = len(changes['inserts']) + len(changes['updates']) + len(changes['deletes'])
+    stats = {
+        'records': len(new_hashes),
+        'inserts': len(changes['inserts']),
+        'updates': len(changes['updates']),
+        'deletes': len(changes['deletes']),
+        'unchanged': changes['unchanged'],
+        # One write per changed record in each store, against one per record in each
+        # store (plus the deletes) for a full re-publish
+        'writes': 2 * changed,
+        'writes_avoided': 2 * changes['unchanged'],
+        'index_failures': 0
+    }
+
+    if not dry_run and changed:
+        sync_dynamodb(client or boto3.client('dynamodb'), table, changes, workers)
+        indexed = bulk_index.index_actions(iter_bulk_actions(changes), host, auth, workers)
+        stats['index_failures'] = indexed['failed']
+    if not dry_run and not stats['index_failures']:
+        # A failed run leaves the manifest alone, so rerunning it resends the same changes
+        manifest.save(new_hashes)
+
+    stats['seconds'] = time.perf_counter() - start
+    print("{records} records: {inserts} inserted, {updates} updated, {deletes} deleted, {unchanged} unchanged; "
+          "{writes} writes, {writes_avoided} avoided{dry} in {seconds:.2f}s".format(
+              dry=' (dry run)' if dry_run else '', **stats))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish only what changed in a new export to DynamoDB and OpenSearch')
+    parser.add_argument('filename', help='DynamoDB typed JSON export written by dataclean.py, e.g. yelp_data.json')
+    parser.add_argument('--manifest', default='publish.manifest.json',
+                        help='content hashes of the last published state; a missing file publishes everything')
+    parser.add_argument('--table', default=table_name)
+    parser.add_argument('--region')
+    parser.add_argument('--host', default=bulk_index.ES_HOST, help='OpenSearch domain endpoint')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--dry-run', action='store_true', help='report the changes without writing anything')
+    args = parser.parse_args()
+
+    client = None if args.dry_run else boto3.client('dynamodb', region_name=args.region)
+    stats = delta_sync(args.filename, args.manifest, client, args.table, args.host, bulk_index.ES_AUTH,
+                       args.workers, args.dry_run)
+    if stats['index_failures']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
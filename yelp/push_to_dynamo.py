@@ -1,39 +1,218 @@
-import boto3
+import argparse
 import json
-from decimal import Decimal
-from botocore.exceptions import ClientError
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-# Initialize a Boto3 DynamoDB resource
-dynamodb = boto3.resource('dynamodb',aws_access_key_id='ACCESS_KEY', aws_secret_access_key='SECRET_KEY', region_name='region')
+import boto3
+from botocore.exceptions import ClientError
 
 # Specify your DynamoDB table name
 table_name = 'yelp-restaurants'
-table = dynamodb.Table(table_name)
-
-def load_data_to_dynamodb(filename):
-    # Open and read the JSON file
-    with open(filename) as file:
-        items = json.load(file)
-        
-    # Iterate over items and put each into the DynamoDB table
+
+# DynamoDB accepts at most 25 put requests per batch_write_item call
+BATCH_SIZE = 25
+MAX_ATTEMPTS = 8
+THROTTLING_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+ATTRIBUTES = ['business_id', 'insertedAtTimestamp', 'name', 'address', 'coordinates',
+              'number_of_reviews', 'rating', 'zip_code', 'cuisine']
+WHITESPACE = re.compile(r'\s*')
+
+
+class LoadError(Exception):
+    pass
+
+
+def iter_json_array(file, chunk_size=1 << 16):
+    # Yields the elements of a top level JSON array without reading the whole file
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    expect = '['
+
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position < len(buffer):
+            char = buffer[position]
+            if expect == '[':
+                if char != '[':
+                    raise LoadError('Expected a JSON array')
+                position += 1
+                expect = 'first'
+                continue
+            if char == ']' and expect in ('first', ','):
+                return
+            if expect == ',':
+                if char != ',':
+                    raise LoadError(f'Expected , or ] at offset {position}')
+                position += 1
+                expect = 'item'
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The element continues in the next chunk
+                if eof:
+                    raise LoadError('Malformed JSON array')
+            else:
+                # A number at the end of a chunk may be cut short ("2." of "2.5"), so the
+                # element only counts once the separator after it has been read
+                after = WHITESPACE.match(buffer, end).end()
+                if eof or (after < len(buffer) and buffer[after] in ',]'):
+                    yield item
+                    position = end
+                    expect = ','
+                    continue
+        elif eof:
+            raise LoadError('Truncated JSON array')
+
+        chunk = file.read(chunk_size)
+        buffer, position = buffer[position:] + chunk, 0
+        eof = not chunk
+
+
+def to_put_request(item):
+    # The export is already in DynamoDB's typed format, which batch_write_item takes as is
+    return {'PutRequest': {'Item': {name: {kind: str(value) for kind, value in item[name].items()}
+                                    for name in ATTRIBUTES if name in item}}}
+
+
+def iter_batches(items, skip=0):
+    # Yields (input position after the batch, put requests). Duplicate keys in one
+    # batch are rejected, so the last copy of a business wins.
+    batch = {}
+    position = 0
     for item in items:
-        print(f"Adding item: {item['business_id']['S']}")
-        # Convert float values to Decimal
-        item['rating']['N'] = Decimal(str(item['rating']['N']))
-        item['number_of_reviews']['N'] = Decimal(str(item['number_of_reviews']['N']))
-        
-        response = table.put_item(Item={
-            'business_id': item['business_id']['S'],
-            'insertedAtTimestamp': item['insertedAtTimestamp']['S'],
-            'name': item['name']['S'],
-            'address': item['address']['S'],
-            'coordinates': item['coordinates']['S'],
-            'number_of_reviews': item['number_of_reviews']['N'],  # Already converted to Decimal
-            'rating': item['rating']['N'],  # Already converted to Decimal
-            'zip_code': item['zip_code']['S'],
-            'cuisine': item['cuisine']['S'],
-        })
-        print(f"Item added: {item['business_id']['S']}")
-
-# Replace 'yelp_data_dynamodb.json' with the path to your JSON file
-load_data_to_dynamodb('Data path from local machine')
\ No newline at end of file
+        position += 1
+        if position <= skip:
+            continue
+        batch[item['business_id']['S']] = to_put_request(item)
+        if (position - skip) % BATCH_SIZE == 0:
+            yield position, list(batch.values())
+            batch = {}
+    if batch:
+        yield position, list(batch.values())
+
+
+def write_batch(client, table, requests, max_attempts=MAX_ATTEMPTS):
+    attempt = 0
+    while requests:
+        try:
+            response = client.batch_write_item(RequestItems={table: requests})
+            requests = response.get('UnprocessedItems', {}).get(table, [])
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLING_ERRORS:
+                raise
+
+        if not requests:
+            return
+        attempt += 1
+        if attempt >= max_attempts:
+            raise LoadError(f'{len(requests)} items still unprocessed after {max_attempts} attempts')
+        # Exponential backoff with full jitter
+        time.sleep(random.uniform(0, min(5.0, 0.05 * 2 ** attempt)))
+
+
+class Checkpoint:
+    """Number of input items that are known to be written, saved after every batch.
+
+    Batches finish out of order on the worker threads, so the saved position only
+    advances past a batch once every batch before it is done too.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.position = 0
+        self._finished = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path) as file:
+                saved = json.load(file)
+            if saved.get('source') == self.source:
+                self.position = saved['items']
+
+    def finished(self, start, end):
+        with self._lock:
+            self._finished[start] = end
+            while self.position in self._finished:
+                self.position = self._finished.pop(self.position)
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'source': self.source, 'items': self.position}, file)
+        os.replace(temporary, self.path)
+
+
+def load_data_to_dynamodb(filename, client=None, table=table_name, workers=4, checkpoint_path=None, report_every=5.0):
+    client = client or boto3.client('dynamodb')
+    checkpoint = Checkpoint(checkpoint_path, filename)
+    resumed_at = checkpoint.position
+    if resumed_at:
+        print(f"Resuming after {resumed_at} items")
+
+    written = 0
+    start = time.perf_counter()
+    last_report = start
+    pending = set()
+
+    with open(filename, encoding='utf-8') as file, ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(first, last, requests):
+            future = executor.submit(write_batch, client, table, requests)
+            future.add_done_callback(lambda f: f.exception() is None and checkpoint.finished(first, last))
+            future.batch_size = len(requests)
+            return future
+
+        def collect(done):
+            nonlocal written
+            for future in done:
+                # Re-raises the first failure; the checkpoint keeps what was written so far
+                future.result()
+                written += future.batch_size
+
+        first = resumed_at
+        for last, requests in iter_batches(iter_json_array(file), skip=resumed_at):
+            # Bounded number of batches in flight keeps memory constant
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(submit(first, last, requests))
+            first = last
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                print(f"{written} items written, {written / (now - start):.0f} items/s")
+                last_report = now
+
+        done, pending = wait(pending)
+        collect(done)
+
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed else 0.0
+    print(f"Loaded {written} items into {table} in {elapsed:.2f}s ({rate:.0f} items/s)")
+    return {'written': written, 'seconds': elapsed, 'items_per_second': rate, 'resumed_at': resumed_at}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load the yelp_data.json export into DynamoDB')
+    parser.add_argument('filename', help='DynamoDB typed JSON export, e.g. yelp_data.json')
+    parser.add_argument('--table', default=table_name)
+    parser.add_argument('--region')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--checkpoint', help='file recording progress so an interrupted load can resume')
+    args = parser.parse_args()
+
+    client = boto3.client('dynamodb', region_name=args.region)
+    load_data_to_dynamodb(args.filename, client, args.table, args.workers, args.checkpoint)
+
+
+if __name__ == '__main__':
+    main()
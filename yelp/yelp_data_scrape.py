@@ -1,13 +1,19 @@
-import requests
-import json
+import argparse
 import csv
 import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
 
-API_KEY= "Yelp account API key"
+API_KEY = os.environ.get('YELP_API_KEY', "Yelp account API key")
 
 
 # API constants, you shouldn't have to change these.
-API_HOST = 'https://api.yelp.com'
+API_HOST = os.environ.get('YELP_API_HOST', 'https://api.yelp.com')
 SEARCH_PATH = '/v3/businesses/search'
 BUSINESS_PATH = '/v3/businesses/'  # Business ID will come after slash.
 
@@ -16,8 +22,80 @@ BUSINESS_PATH = '/v3/businesses/'  # Business ID will come after slash.
 DEFAULT_TERM = 'dinner'
 DEFAULT_LOCATION = 'Manhattan'
 SEARCH_LIMIT = 50
+# The search API does not page past 1000 results
+MAX_RESULTS = 1000
+
+#cuisine list Chinese, Italian, Japanese, Mexican, Greek
+CUISINES = ['Chinese', 'Italian', 'Indian']
+FIELD_NAMES = ['business_id', 'insertedAtTimestamp', 'name', 'address', 'coordinates', 'number_of_reviews', 'rating', 'zip_code', 'cuisine']
+
+# Yelp allows a handful of queries per second per API key
+REQUESTS_PER_SECOND = 5
+WORKERS = 4
+MAX_ATTEMPTS = 5
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `capacity`.
+
+    The default capacity of 1 spaces requests evenly, so no one-second window sees
+    more than `rate` of them.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class Checkpoint:
+    """Pages already written to the CSV and the ids seen per cuisine.
+
+    Saved after every page, so an interrupted crawl restarts with the pages it is
+    missing. A crash between writing a page and saving can repeat that page's rows;
+    dataclean.py drops duplicate business ids.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.totals = {}
+        self.ids = {}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                saved = json.load(file)
+            self.pages = {cuisine: set(offsets) for cuisine, offsets in saved['pages'].items()}
+            self.totals = saved['totals']
+            self.ids = {cuisine: set(ids) for cuisine, ids in saved['ids'].items()}
+
+    def save(self):
+        if not self.path:
+            return
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({
+                'pages': {cuisine: sorted(offsets) for cuisine, offsets in self.pages.items()},
+                'totals': self.totals,
+                'ids': {cuisine: sorted(ids) for cuisine, ids in self.ids.items()}
+            }, file)
+        os.replace(temporary, self.path)
+
 
-def search(api_key, term, location, offset):
+def search(api_key, term, location, offset, session=requests, api_host=API_HOST):
     url_params = {
         'term': term.replace(' ', '+'),
         'location': location.replace(' ', '+'),
@@ -27,65 +105,126 @@ def search(api_key, term, location, offset):
     headers = {
         'Authorization': 'Bearer %s' % api_key,
     }
-    url = '{0}{1}'.format(API_HOST, SEARCH_PATH)
-    response = requests.request('GET', url, headers=headers, params=url_params)
+    url = '{0}{1}'.format(api_host, SEARCH_PATH)
+    response = session.request('GET', url, headers=headers, params=url_params, timeout=30)
+    if response.status_code == 429:
+        return None
 
     return response.json()
 
-def scrape_yelp():
-    #cuisine list Chinese, Italian, Japanese, Mexican, Greek
-    cuisines = ['Chinese', 'Italian', 'Indian']
-    # create a csv file with headers
 
-    # with open('yelp_data_new.csv', 'w', newline='', encoding='utf-8') as yelp_csv:
-    #     field_names = ['business_id', 'insertedAtTimestamp', 'name', 'address', 'coordinates','number_of_reviews', 'rating', 'zip_code', 'cuisine']
-    #     writer = csv.DictWriter(yelp_csv, fieldnames=field_names, delimiter='|')
-    #     writer.writeheader()  # Uncommeted to write the header
-    # Rest of your code follows
+def fetch_page(session, bucket, api_key, api_host, term, offset):
+    # Retries rate limited pages with exponential backoff, each attempt waiting for a token
+    for attempt in range(MAX_ATTEMPTS):
+        bucket.acquire()
+        res = search(api_key, term, DEFAULT_LOCATION, offset, session, api_host)
+        if res is not None:
+            return res
+        time.sleep(0.5 * 2 ** attempt)
+    raise RuntimeError('Still rate limited after {} attempts for {} offset {}'.format(MAX_ATTEMPTS, term, offset))
 
 
-    with open('yelp_data_new.csv', 'a') as yelp_csv:
-        field_names = ['business_id', 'insertedAtTimestamp', 'name', 'address', 'coordinates','number_of_reviews', 'rating', 'zip_code', 'cuisine']
-        writer = csv.DictWriter(yelp_csv, fieldnames=field_names, delimiter='|')
-        writer.writeheader()
+def to_row(x, cuisine):
+    return {
+        'business_id': x['id'],
+        'insertedAtTimestamp': str(datetime.datetime.now()),
+        'name': x['name'],
+        'address': x['location']['display_address'],
+        'coordinates': str(x['coordinates']['latitude']) + ',' + str(x['coordinates']['longitude']),
+        'number_of_reviews': x['review_count'],
+        'rating': x['rating'],
+        'zip_code': x['location']['zip_code'],
+        'cuisine': cuisine
+    }
+
+
+def scrape_yelp(output='yelp_data_new.csv', cuisines=CUISINES, workers=WORKERS, rate=REQUESTS_PER_SECOND,
+                checkpoint_path='yelp_data_new.checkpoint.json', api_key=API_KEY, api_host=API_HOST):
+    checkpoint = Checkpoint(checkpoint_path)
+    bucket = TokenBucket(rate)
+    session = requests.Session()
+    start = time.perf_counter()
+    requests_made = 0
+
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+    with open(output, 'a', newline='', encoding='utf-8') as yelp_csv, ThreadPoolExecutor(max_workers=workers) as executor:
+        writer = csv.DictWriter(yelp_csv, fieldnames=FIELD_NAMES, delimiter='|')
+        if new_file:
+            writer.writeheader()
+
+        pending = {}
+
+        def schedule(cuisine, offsets):
+            for offset in offsets:
+                if offset in checkpoint.pages.setdefault(cuisine, set()):
+                    continue
+                future = executor.submit(fetch_page, session, bucket, api_key, api_host, cuisine + ' restaurant', offset)
+                pending[future] = (cuisine, offset)
+
+        def offsets_for(cuisine):
+            return range(0, min(checkpoint.totals[cuisine], MAX_RESULTS), SEARCH_LIMIT)
+
         for cuisine in cuisines:
-            print("scraping {} cuisine".format(cuisine))
-            cuisine = cuisine + ' restaurant'
-            offset = 0
-            records = 0
-            res_id = []
-            while len(res_id) < 1000:
-                print("Start of the loop, {cui} cuisine has {rec} rows".format(cui=cuisine, rec=len(res_id)))
-                res = search(API_KEY, cuisine, DEFAULT_LOCATION, offset)
+            checkpoint.ids.setdefault(cuisine, set())
+            if cuisine in checkpoint.totals:
+                # Resuming: the total is known, so every missing page can go out at once
+                schedule(cuisine, offsets_for(cuisine))
+            else:
+                print("scraping {} cuisine".format(cuisine))
+                schedule(cuisine, [0])
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                cuisine, offset = pending.pop(future)
+                if future.cancelled():
+                    continue
+                res = future.result()
+                requests_made += 1
+                res_id = checkpoint.ids[cuisine]
+
                 if res.get('businesses') is None:
                     print("No {} cuisine found".format(cuisine))
-                    break
-                for x in res['businesses']:
-                    if x['id'] in res_id:
-                        continue
-                    res_id.append(x['id'])
-                    row = {
-                        'business_id': x['id'],
-                        'insertedAtTimestamp': str(datetime.datetime.now()),
-                        'name': x['name'],
-                        'address': x['location']['display_address'],
-                        'coordinates': str(x['coordinates']['latitude']) + ',' + str(x['coordinates']['longitude']),
-                        'number_of_reviews': x['review_count'],
-                        'rating': x['rating'],
-                        'zip_code': x['location']['zip_code'],
-                        'cuisine': cuisine
-
-                    }
-                    writer.writerow(row)
-                records += len(res['businesses'])
-                if records > res['total']:
-                    break
-                offset += 50
-                print("End of the loop, {cui} cuisine has {rec} rows".format(cui=cuisine, rec=len(res_id)))
-            print("{cui} cuisine has {rec} rows".format(cui=cuisine, rec=len(res_id)))
+                else:
+                    for x in res['businesses']:
+                        if x['id'] in res_id or len(res_id) >= MAX_RESULTS:
+                            continue
+                        res_id.add(x['id'])
+                        writer.writerow(to_row(x, cuisine + ' restaurant'))
+
+                checkpoint.pages[cuisine].add(offset)
+                if offset == 0 and res.get('total') is not None:
+                    checkpoint.totals[cuisine] = res['total']
+                    schedule(cuisine, offsets_for(cuisine))
+
+                yelp_csv.flush()
+                checkpoint.save()
+
+                if len(res_id) >= MAX_RESULTS:
+                    # Enough for this cuisine; drop its pages that have not started
+                    for other, (other_cuisine, _) in list(pending.items()):
+                        if other_cuisine == cuisine and other.cancel():
+                            del pending[other]
+
+                print("{cui} cuisine has {rec} rows".format(cui=cuisine, rec=len(res_id)))
+
+    elapsed = time.perf_counter() - start
+    rows = sum(len(checkpoint.ids.get(cuisine, ())) for cuisine in cuisines)
+    print("Scraped {} pages in {:.1f}s ({:.1f} pages/s), {} restaurants".format(
+        requests_made, elapsed, requests_made / elapsed if elapsed else 0.0, rows))
+    return {'pages': requests_made, 'seconds': elapsed, 'rows': rows}
+
 
 def main():
-    scrape_yelp()
+    parser = argparse.ArgumentParser(description='Scrape Manhattan restaurants per cuisine from the Yelp search API')
+    parser.add_argument('--output', default='yelp_data_new.csv')
+    parser.add_argument('--cuisines', nargs='+', default=CUISINES)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help='requests per second')
+    parser.add_argument('--checkpoint', default='yelp_data_new.checkpoint.json')
+    args = parser.parse_args()
+
+    scrape_yelp(args.output, args.cuisines, args.workers, args.rate, args.checkpoint)
 
 if __name__=='__main__':
-    main()
\ No newline at end of file
+    main()